@@ -1,28 +1,53 @@
+from concurrent.futures import ThreadPoolExecutor
+
 import typer
-import pandas as pd
-from src.models.universe import STOCK_SYMBOLS, SECTOR_ETFS
-from src.models.sector_map import validate_universe
-from src.utils.data_ingestion import (
-    get_daily_batch, get_weekly_batch, get_hourly_batch,
-    get_15m_batch, get_5m_batch,
-)
-from src.utils.rs_engine import compute_stock_rs
-from src.utils.spot_engine import spot_scan_symbol, spot_scan_universe
-from src.utils.logger import (
-    log_scan, log_watchlists,
-    log_spot_universe, log_spot_single,
-)
-from src.utils.reports import (
-    sector_trend_report,
-    sector_change_report,
-    stock_tracker_report,
-    stock_ranking_report,
-    watchlist_frequency_report,
+from src.models.universe import (
+    STOCK_SYMBOLS, ALL_SYMBOLS_NO_BENCH,
+    STOCK_SYMBOLS_SET, SECTOR_ETFS_SET,
 )
+from src.models.sector_map import validate_universe
+
+# Heavy modules (pandas, pyarrow, the Alpaca SDK) are imported inside each
+# command so report commands and --help don't pay for what they don't use.
 
 app = typer.Typer()
 
 
+def _fmt(value, spec: str, prefix: str = "", suffix: str = "", scale: float = 1.0) -> str:
+    """Format a metric for display; missing (None/NaN) values render as N/A."""
+    # `v != v` is the NaN test — plain float compare, no pandas dispatch
+    if value is None or value != value:
+        return "N/A"
+    return f"{prefix}{value * scale:{spec}}{suffix}"
+
+
+def _require_credentials() -> None:
+    """Fail fast, before any fetching output, if the API keys are missing."""
+    from src.utils.data_ingestion import check_credentials
+
+    try:
+        check_credentials()
+    except RuntimeError as exc:
+        typer.echo(f"ERROR: {exc}")
+        raise typer.Exit(code=1)
+
+
+def _add_spy(target: dict, source: dict) -> None:
+    """Carry the SPY benchmark frame over into a universe subset."""
+    if "SPY" in source:
+        target["SPY"] = source["SPY"]
+
+
+def _split_universe(data: dict) -> tuple[dict, dict]:
+    """Split one timeframe's bars into (sector ETFs, stocks), each with SPY."""
+    available = data.keys()
+    sector_data = {s: data[s] for s in SECTOR_ETFS_SET & available}
+    stock_data  = {s: data[s] for s in STOCK_SYMBOLS_SET & available}
+    _add_spy(sector_data, data)
+    _add_spy(stock_data, data)
+    return sector_data, stock_data
+
+
 @app.command()
 def scan(
     top_n: int = typer.Option(10, help="Number of top/bottom stocks to display"),
@@ -33,23 +58,34 @@ def scan(
     sector: str = typer.Option(None, help="Filter to a sector ETF (e.g. XLK)"),
 ):
     """Pull fresh data and score the universe."""
+    from src.utils.data_ingestion import get_daily_batch, get_weekly_batch, get_hourly_batch
+    from src.utils.rs_engine import compute_stock_rs
+    from src.utils.logger import ScanContext, log_scan, log_watchlists
+
+    _require_credentials()
 
     unmapped = validate_universe(STOCK_SYMBOLS)
     if unmapped:
         typer.echo(f"WARNING: no sector mapping for {unmapped}")
 
-    all_symbols = list(set(STOCK_SYMBOLS + SECTOR_ETFS))
+    all_symbols = ALL_SYMBOLS_NO_BENCH
+
+    # Timeframes are independent round-trips — fetch them concurrently
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        typer.echo("Fetching daily bars...")
+        fut_daily = pool.submit(get_daily_batch, all_symbols, trading_days=trading_days)
 
-    typer.echo("Fetching daily bars...")
-    data_daily = get_daily_batch(all_symbols, trading_days=trading_days)
+        typer.echo("Fetching weekly bars...")
+        fut_weekly = pool.submit(get_weekly_batch, all_symbols, weeks=weeks)
 
-    typer.echo("Fetching weekly bars...")
-    data_weekly = get_weekly_batch(all_symbols, weeks=weeks)
+        fut_hourly = None
+        if not no_hourly:
+            typer.echo("Fetching hourly bars...")
+            fut_hourly = pool.submit(get_hourly_batch, all_symbols, trading_days=hourly_days)
 
-    data_hourly = None
-    if not no_hourly:
-        typer.echo("Fetching hourly bars...")
-        data_hourly = get_hourly_batch(all_symbols, trading_days=hourly_days)
+        data_daily  = fut_daily.result()
+        data_weekly = fut_weekly.result()
+        data_hourly = fut_hourly.result() if fut_hourly is not None else None
 
     if not data_daily or not data_weekly:
         typer.echo("ERROR: No data returned. Check API keys / network.")
@@ -57,29 +93,9 @@ def scan(
 
     typer.echo("Computing relative strength...")
 
-    sector_daily  = {s: data_daily[s]  for s in SECTOR_ETFS if s in data_daily}
-    sector_weekly = {s: data_weekly[s] for s in SECTOR_ETFS if s in data_weekly}
-    sector_hourly = None
-    if data_hourly:
-        sector_hourly = {s: data_hourly[s] for s in SECTOR_ETFS if s in data_hourly}
-
-    if "SPY" in data_daily:
-        sector_daily["SPY"]  = data_daily["SPY"]
-        sector_weekly["SPY"] = data_weekly["SPY"]
-        if data_hourly is not None and sector_hourly is not None and "SPY" in data_hourly:
-            sector_hourly["SPY"] = data_hourly["SPY"]
-
-    stock_daily  = {s: data_daily[s]  for s in STOCK_SYMBOLS if s in data_daily}
-    stock_weekly = {s: data_weekly[s] for s in STOCK_SYMBOLS if s in data_weekly}
-    stock_hourly = None
-    if data_hourly:
-        stock_hourly = {s: data_hourly[s] for s in STOCK_SYMBOLS if s in data_hourly}
-
-    if "SPY" in data_daily:
-        stock_daily["SPY"]  = data_daily["SPY"]
-        stock_weekly["SPY"] = data_weekly["SPY"]
-        if data_hourly is not None and stock_hourly is not None and "SPY" in data_hourly:
-            stock_hourly["SPY"] = data_hourly["SPY"]
+    sector_daily, stock_daily   = _split_universe(data_daily)
+    sector_weekly, stock_weekly = _split_universe(data_weekly)
+    sector_hourly, stock_hourly = _split_universe(data_hourly) if data_hourly else (None, None)
 
     sector_df = compute_stock_rs(sector_daily, sector_weekly, sector_hourly)
     stock_df  = compute_stock_rs(stock_daily, stock_weekly, stock_hourly)
@@ -97,9 +113,11 @@ def scan(
         "hourly_days": hourly_days,
         "no_hourly": no_hourly,
     }
-    sector_path = log_scan(sector_df, scan_type="sector", metadata=scan_meta)
-    stock_path  = log_scan(stock_df,  scan_type="stock",  metadata=scan_meta)
-    strong_path, weak_path = log_watchlists(stock_df, n=top_n, metadata=scan_meta)
+    # One context per run so every output shares a scan_uuid
+    ctx = ScanContext.now()
+    sector_path = log_scan(sector_df, scan_type="sector", metadata=scan_meta, ctx=ctx)
+    stock_path  = log_scan(stock_df,  scan_type="stock",  metadata=scan_meta, ctx=ctx)
+    strong_path, weak_path = log_watchlists(stock_df, n=top_n, metadata=scan_meta, ctx=ctx)
 
     typer.echo(f"  → {sector_path}")
     typer.echo(f"  → {stock_path}")
@@ -111,15 +129,16 @@ def scan(
         display_cols.append("hourly_bias")
     display_cols += ["composite_score", "aligned"]
 
-    typer.echo("\n=== Sector Ranking ===")
     sector_display = [c for c in display_cols if c in sector_df.columns]
-    typer.echo(sector_df[sector_display].to_string(index=False))
-
-    typer.echo(f"\n=== Top {top_n} Stocks ===")
-    typer.echo(stock_df[display_cols].head(top_n).to_string(index=False))
-
-    typer.echo(f"\n=== Weakest {top_n} Stocks ===")
-    typer.echo(stock_df[display_cols].tail(top_n).to_string(index=False))
+    out = [
+        "\n=== Sector Ranking ===",
+        sector_df[sector_display].to_string(index=False),
+        f"\n=== Top {top_n} Stocks ===",
+        stock_df[display_cols].head(top_n).to_string(index=False),
+        f"\n=== Weakest {top_n} Stocks ===",
+        stock_df[display_cols].tail(top_n).to_string(index=False),
+    ]
+    typer.echo("\n".join(out))
 
 
 @app.command()
@@ -128,26 +147,41 @@ def spot(
     sector: str = typer.Option(None, help="Filter universe to a sector ETF"),
 ):
     """Intraday momentum spot check — single symbol or full universe."""
+    from src.utils.data_ingestion import (
+        get_daily_batch, get_weekly_batch, get_hourly_batch,
+        get_15m_batch, get_5m_batch,
+    )
+    from src.utils.spot_engine import spot_scan_symbol, spot_scan_universe
+    from src.utils.logger import log_spot_universe, log_spot_single
+
+    _require_credentials()
 
     if symbol:
         symbols = list(set([symbol.upper(), "SPY"]))
     else:
-        symbols = list(set(STOCK_SYMBOLS + ["SPY"]))
+        symbols = STOCK_SYMBOLS
 
-    typer.echo("Fetching daily bars...")
-    data_daily = get_daily_batch(symbols, trading_days=60)
+    with ThreadPoolExecutor(max_workers=5) as pool:
+        typer.echo("Fetching daily bars...")
+        fut_daily = pool.submit(get_daily_batch, symbols, trading_days=60)
 
-    typer.echo("Fetching weekly bars...")
-    data_weekly = get_weekly_batch(symbols, weeks=26)
+        typer.echo("Fetching weekly bars...")
+        fut_weekly = pool.submit(get_weekly_batch, symbols, weeks=26)
 
-    typer.echo("Fetching 1H bars...")
-    data_1h = get_hourly_batch(symbols, trading_days=5)
+        typer.echo("Fetching 1H bars...")
+        fut_1h = pool.submit(get_hourly_batch, symbols, trading_days=5)
 
-    typer.echo("Fetching 15m bars...")
-    data_15m = get_15m_batch(symbols, trading_days=5)
+        typer.echo("Fetching 15m bars...")
+        fut_15m = pool.submit(get_15m_batch, symbols, trading_days=5)
 
-    typer.echo("Fetching 5m bars...")
-    data_5m = get_5m_batch(symbols, trading_days=2)
+        typer.echo("Fetching 5m bars...")
+        fut_5m = pool.submit(get_5m_batch, symbols, trading_days=2)
+
+        data_daily  = fut_daily.result()
+        data_weekly = fut_weekly.result()
+        data_1h     = fut_1h.result()
+        data_15m    = fut_15m.result()
+        data_5m     = fut_5m.result()
 
     if not data_daily:
         typer.echo("ERROR: No data returned.")
@@ -172,45 +206,48 @@ def spot(
         spot_path = log_spot_single(result, metadata=spot_meta)
         typer.echo(f"  → {spot_path}")
 
-        # --- Pretty print ---
-        typer.echo(f"\n{'='*50}")
-        typer.echo(f"  SPOT SCAN: {sym}")
-        typer.echo(f"{'='*50}")
-
-        typer.echo(f"\n--- Context ---")
-        typer.echo(f"  Sector:          {result['sector']}")
-        typer.echo(f"  Price:           ${result['price']:.2f}")
-
-        typer.echo(f"\n--- ATR ---")
-        typer.echo(f"  Weekly ATR:      ${result['weekly_atr']:.2f}" if not pd.isna(result['weekly_atr']) else "  Weekly ATR:      N/A")
-        typer.echo(f"  Daily ATR:       ${result['daily_atr']:.2f}" if not pd.isna(result['daily_atr']) else "  Daily ATR:       N/A")
-        typer.echo(f"  Hourly ATR:      ${result['hourly_atr']:.2f}" if not pd.isna(result['hourly_atr']) else "  Hourly ATR:      N/A")
-
-        typer.echo(f"\n--- Range Consumed ---")
-        typer.echo(f"  Daily:           {result['daily_range_consumed']*100:.1f}%" if not pd.isna(result['daily_range_consumed']) else "  Daily:           N/A")
-        typer.echo(f"  Weekly:          {result['weekly_range_consumed']*100:.1f}%" if not pd.isna(result['weekly_range_consumed']) else "  Weekly:           N/A")
-
-        typer.echo(f"\n--- Intraday RS vs SPY ---")
-        typer.echo(f"  1H RS:           {result['1h_rs']:+.4f}" if not pd.isna(result['1h_rs']) else "  1H RS:           N/A")
-        typer.echo(f"  15m RS:          {result['15m_rs']:+.4f}" if not pd.isna(result['15m_rs']) else "  15m RS:          N/A")
-        typer.echo(f"  5m RS:           {result['5m_rs']:+.4f}" if not pd.isna(result['5m_rs']) else "  5m RS:           N/A")
-
-        typer.echo(f"\n--- Intraday Momentum ---")
-        typer.echo(f"  Composite:       {result['intraday_composite']:+.4f}" if not pd.isna(result['intraday_composite']) else "  Composite:       N/A")
-        typer.echo(f"  Bias:            {result['intraday_bias']}")
-        typer.echo(f"  Aligned:         {result['intraday_aligned']}")
-
-        typer.echo(f"\n--- Volume ---")
-        typer.echo(f"  RVOL (daily):    {result['rvol_daily']:.2f}x" if not pd.isna(result['rvol_daily']) else "  RVOL (daily):    N/A")
-        typer.echo(f"  1H RVOL:         {result['1h_rvol']:.2f}x" if not pd.isna(result['1h_rvol']) else "  1H RVOL:         N/A")
-        typer.echo(f"  15m RVOL:        {result['15m_rvol']:.2f}x" if not pd.isna(result['15m_rvol']) else "  15m RVOL:        N/A")
-        typer.echo(f"  5m RVOL:         {result['5m_rvol']:.2f}x" if not pd.isna(result['5m_rvol']) else "  5m RVOL:         N/A")
-
-        typer.echo(f"\n--- Distance from Levels ---")
-        typer.echo(f"  From daily high: {result['pct_from_daily_high']:+.2f}%" if not pd.isna(result['pct_from_daily_high']) else "  From daily high: N/A")
-        typer.echo(f"  From daily low:  {result['pct_from_daily_low']:+.2f}%" if not pd.isna(result['pct_from_daily_low']) else "  From daily low:  N/A")
-        typer.echo(f"  From 20d high:   {result['pct_from_20d_high']:+.2f}%" if not pd.isna(result['pct_from_20d_high']) else "  From 20d high:   N/A")
-        typer.echo(f"  From 20d low:    {result['pct_from_20d_low']:+.2f}%" if not pd.isna(result['pct_from_20d_low']) else "  From 20d low:    N/A")
+        # --- Pretty print (buffered, echoed once) ---
+        out: list[str] = []
+        out.append(f"\n{'='*50}")
+        out.append(f"  SPOT SCAN: {sym}")
+        out.append(f"{'='*50}")
+
+        out.append(f"\n--- Context ---")
+        out.append(f"  Sector:          {result['sector']}")
+        out.append(f"  Price:           ${result['price']:.2f}")
+
+        out.append(f"\n--- ATR ---")
+        out.append(f"  Weekly ATR:      {_fmt(result['weekly_atr'], '.2f', prefix='$')}")
+        out.append(f"  Daily ATR:       {_fmt(result['daily_atr'], '.2f', prefix='$')}")
+        out.append(f"  Hourly ATR:      {_fmt(result['hourly_atr'], '.2f', prefix='$')}")
+
+        out.append(f"\n--- Range Consumed ---")
+        out.append(f"  Daily:           {_fmt(result['daily_range_consumed'], '.1f', suffix='%', scale=100)}")
+        out.append(f"  Weekly:          {_fmt(result['weekly_range_consumed'], '.1f', suffix='%', scale=100)}")
+
+        out.append(f"\n--- Intraday RS vs SPY ---")
+        out.append(f"  1H RS:           {_fmt(result['1h_rs'], '+.4f')}")
+        out.append(f"  15m RS:          {_fmt(result['15m_rs'], '+.4f')}")
+        out.append(f"  5m RS:           {_fmt(result['5m_rs'], '+.4f')}")
+
+        out.append(f"\n--- Intraday Momentum ---")
+        out.append(f"  Composite:       {_fmt(result['intraday_composite'], '+.4f')}")
+        out.append(f"  Bias:            {result['intraday_bias']}")
+        out.append(f"  Aligned:         {result['intraday_aligned']}")
+
+        out.append(f"\n--- Volume ---")
+        out.append(f"  RVOL (daily):    {_fmt(result['rvol_daily'], '.2f', suffix='x')}")
+        out.append(f"  1H RVOL:         {_fmt(result['1h_rvol'], '.2f', suffix='x')}")
+        out.append(f"  15m RVOL:        {_fmt(result['15m_rvol'], '.2f', suffix='x')}")
+        out.append(f"  5m RVOL:         {_fmt(result['5m_rvol'], '.2f', suffix='x')}")
+
+        out.append(f"\n--- Distance from Levels ---")
+        out.append(f"  From daily high: {_fmt(result['pct_from_daily_high'], '+.2f', suffix='%')}")
+        out.append(f"  From daily low:  {_fmt(result['pct_from_daily_low'], '+.2f', suffix='%')}")
+        out.append(f"  From 20d high:   {_fmt(result['pct_from_20d_high'], '+.2f', suffix='%')}")
+        out.append(f"  From 20d low:    {_fmt(result['pct_from_20d_low'], '+.2f', suffix='%')}")
+
+        typer.echo("\n".join(out))
 
     else:
         # --- Full universe ---
@@ -255,16 +292,20 @@ def spot(
         if "pct_from_20d_high" in display_df.columns:
             display_df["pct_from_20d_high"] = display_df["pct_from_20d_high"].round(2)
 
-        typer.echo(f"\n=== Top 10 Intraday Momentum ===")
-        typer.echo(display_df.head(10).to_string(index=False))
-
-        typer.echo(f"\n=== Bottom 10 Intraday Momentum ===")
-        typer.echo(display_df.tail(10).to_string(index=False))
+        out = [
+            "\n=== Top 10 Intraday Momentum ===",
+            display_df.head(10).to_string(index=False),
+            "\n=== Bottom 10 Intraday Momentum ===",
+            display_df.tail(10).to_string(index=False),
+        ]
+        typer.echo("\n".join(out))
 
 
 @app.command()
 def report_sectors():
     """Show sector score trends over time."""
+    from src.utils.reports import sector_trend_report, sector_change_report
+
     typer.echo("Generating sector trend report...")
     trend = sector_trend_report()
     if not trend.empty:
@@ -281,6 +322,8 @@ def report_stock(
     symbol: str = typer.Argument(..., help="Ticker to track (e.g. NVDA)"),
 ):
     """Show score history for a single stock."""
+    from src.utils.reports import stock_tracker_report
+
     typer.echo(f"Generating report for {symbol.upper()}...")
     report = stock_tracker_report(symbol)
     if not report.empty:
@@ -292,6 +335,8 @@ def report_stock(
 @app.command()
 def report_rankings():
     """Show full universe ranking history over time."""
+    from src.utils.reports import stock_ranking_report
+
     typer.echo("Generating stock ranking history...")
     rankings = stock_ranking_report()
     if not rankings.empty:
@@ -303,6 +348,8 @@ def report_watchlists(
     top_n: int = typer.Option(10, help="Show top N most frequent symbols"),
 ):
     """Show which stocks appear most often on strong/weak lists."""
+    from src.utils.reports import watchlist_frequency_report
+
     typer.echo("Analyzing watchlist frequency...\n")
 
     strong_freq, weak_freq = watchlist_frequency_report()
@@ -3,6 +3,8 @@ Hard-coded stock → sector ETF mapping.
 Must stay in sync with universe.py STOCK_SYMBOLS.
 """
 
+from collections import defaultdict
+
 SECTOR_MAP: dict[str, str] = {
     # Technology (XLK)
     "AAPL": "XLK",
@@ -146,14 +148,25 @@ SECTOR_MAP: dict[str, str] = {
 }
 
 
+def _build_sector_index() -> dict[str, tuple[str, ...]]:
+    """Invert SECTOR_MAP once at import: sector ETF → stocks."""
+    index: defaultdict[str, list[str]] = defaultdict(list)
+    for sym, sec in SECTOR_MAP.items():
+        index[sec].append(sym)
+    return {sec: tuple(syms) for sec, syms in index.items()}
+
+
+_SECTOR_TO_STOCKS = _build_sector_index()
+
+
 def get_sector(symbol: str) -> str | None:
     """Return sector ETF for a stock, or None if unmapped."""
     return SECTOR_MAP.get(symbol)
 
 
-def get_stocks_in_sector(sector_etf: str) -> list[str]:
+def get_stocks_in_sector(sector_etf: str) -> tuple[str, ...]:
     """Return all stocks mapped to a given sector ETF."""
-    return [sym for sym, sec in SECTOR_MAP.items() if sec == sector_etf]
+    return _SECTOR_TO_STOCKS.get(sector_etf, ())
 
 
 def validate_universe(stock_symbols: list[str]) -> list[str]:
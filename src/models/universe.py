@@ -65,3 +65,10 @@ SECTOR_ETFS = [
 # Deduplicated master list
 ALL_SYMBOLS = sorted(set(STOCK_SYMBOLS + SECTOR_ETFS + [BENCHMARK]))
 
+# Same, without the benchmark (the fetch layer always adds it)
+ALL_SYMBOLS_NO_BENCH = sorted(set(STOCK_SYMBOLS + SECTOR_ETFS))
+
+# Membership sets for filtering fetched data
+STOCK_SYMBOLS_SET = frozenset(STOCK_SYMBOLS)
+SECTOR_ETFS_SET = frozenset(SECTOR_ETFS)
+
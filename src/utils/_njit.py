@@ -0,0 +1,20 @@
+"""
+Optional Numba JIT.
+
+`njit` compiles numeric kernels when numba is installed and falls back
+to a no-op decorator otherwise, so kernels stay plain NumPy/Python.
+Supports both `@njit` and `@njit(cache=True, ...)`. `prange` falls back
+to `range` the same way.
+"""
+
+try:
+    from numba import njit, prange  # pyright: ignore[reportMissingImports]
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+    prange = range
+
+    def njit(*args, **kwargs):  # pyright: ignore[reportRedeclaration]
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda f: f
@@ -0,0 +1,74 @@
+"""
+Fused RS component kernel.
+
+Computes slope, RS, relative volume and volatility ratio for every symbol
+of one timeframe in a single pass per symbol, parallel across symbols.
+Only worth calling when numba is installed — see `HAS_NUMBA`; without it
+the NumPy column reductions in rs_engine are faster than these loops.
+"""
+
+import numpy as np
+
+from src.utils._njit import njit, prange
+
+
+@njit(parallel=True, cache=True)
+def compute_all(log_close: np.ndarray,
+                volume: np.ndarray,
+                lengths: np.ndarray,
+                bench_ret: float,
+                bench_vol: float,
+                slope_weights: np.ndarray,
+                rs_lb: int,
+                rvol_lb: int,
+                vol_lb: int):
+    """
+    log_close, volume: (N, n) right-aligned windows; lengths: bars per symbol.
+    Entries left of a symbol's history are never read, so padding is free.
+    Returns (slope, rs, rvol, vol_ratio), NaN where history is too short.
+    """
+    N, n = log_close.shape
+    slope_lb = slope_weights.shape[0]
+    slope = np.full(N, np.nan)
+    rs = np.full(N, np.nan)
+    rvol = np.full(N, np.nan)
+    vol_ratio = np.full(N, np.nan)
+
+    for i in prange(N):
+        m = lengths[i]
+        last = log_close[i, n - 1]
+
+        if m >= slope_lb:
+            acc = 0.0
+            for j in range(slope_lb):
+                acc += log_close[i, n - slope_lb + j] * slope_weights[j]
+            slope[i] = acc
+
+        if m >= rs_lb:
+            rs[i] = last - log_close[i, n - rs_lb] - bench_ret
+
+        if m >= rvol_lb:
+            total = 0.0
+            for j in range(n - rvol_lb, n):
+                total += volume[i, j]
+            avg = total / rvol_lb
+            if avg != 0:
+                rvol[i] = volume[i, n - 1] / avg
+
+        if m >= vol_lb:
+            # Welford over the last vol_lb log returns the symbol has
+            k = 0
+            mean = 0.0
+            m2 = 0.0
+            prev = log_close[i, n - min(m, vol_lb + 1)]
+            for j in range(n - min(m, vol_lb + 1) + 1, n):
+                cur = log_close[i, j]
+                k += 1
+                d = (cur - prev) - mean
+                mean += d / k
+                m2 += d * ((cur - prev) - mean)
+                prev = cur
+            if k >= 2:
+                vol_ratio[i] = np.sqrt(m2 / (k - 1)) / bench_vol
+
+    return slope, rs, rvol, vol_ratio
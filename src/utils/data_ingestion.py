@@ -2,15 +2,28 @@
 
 """
 Alpaca data ingestion for daily and weekly bar data.
+
+Fetched bars are cached on disk under .cache/bars/{timeframe}/{symbol}.parquet
+so repeat runs only request the bars missing since the last fetch.
+
+OHLC columns are returned as float32 and volume as uint32 (see BAR_DTYPES);
+callers that need float64 precision must cast back explicitly.
 """
 
-from datetime import datetime, timedelta, timezone
-from typing import Dict, List, Optional, cast
+from datetime import datetime, time, timedelta, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, cast
+from zoneinfo import ZoneInfo
 
 import os
+import json
 import logging
+import threading
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
 from dotenv import load_dotenv
 
 from alpaca.data.historical import StockHistoricalDataClient
@@ -18,7 +31,12 @@ from alpaca.data.requests import StockBarsRequest
 from alpaca.data.timeframe import TimeFrame, TimeFrameUnit
 from alpaca.data.enums import DataFeed, Adjustment
 
-load_dotenv()
+# Only hit .env on disk when the keys aren't already in the environment
+if not os.environ.get("ALPACA_API_KEY"):
+    load_dotenv()
+
+ALPACA_API_KEY = os.environ.get("ALPACA_API_KEY")
+ALPACA_SECRET_KEY = os.environ.get("ALPACA_SECRET_KEY")
 
 logger = logging.getLogger(__name__)
 
@@ -26,21 +44,86 @@ BENCHMARK = "SPY"
 MAX_SYMBOLS_PER_REQUEST = 200
 REQUIRED_COLUMNS = {"open", "high", "low", "close", "volume"}
 
+# IEX is free; accounts with a SIP subscription get full-market volume
+# and higher rate limits (ALPACA_FEED=sip)
+FEED = DataFeed(os.environ.get("ALPACA_FEED", DataFeed.IEX.value).lower())
+
+# float32 keeps ~7 significant digits — ample for prices and the ratio /
+# z-score math downstream — and halves the bytes every indicator touches
+BAR_DTYPES = {
+    "open": "float32",
+    "high": "float32",
+    "low": "float32",
+    "close": "float32",
+    "volume": "uint32",
+}
+UINT32_MAX = np.iinfo(np.uint32).max
+
+CACHE_DIR = Path(".cache") / "bars"
+
+# Alpaca prints bars during the extended-hours session (04:00–20:00 ET)
+MARKET_TZ = ZoneInfo("America/New_York")
+SESSION_OPEN = time(4, 0)
+SESSION_CLOSE = time(20, 0)
+
+# TimeFrames are immutable — build them once
+_TF_DAY  = TimeFrame(amount=1, unit=TimeFrameUnit.Day)  # pyright: ignore[reportArgumentType]
+_TF_WEEK = TimeFrame(amount=1, unit=TimeFrameUnit.Week)  # pyright: ignore[reportArgumentType]
+_TF_HOUR = TimeFrame(amount=1, unit=TimeFrameUnit.Hour)  # pyright: ignore[reportArgumentType]
+_TF_15M  = TimeFrame(amount=15, unit=TimeFrameUnit.Minute)  # pyright: ignore[reportArgumentType]
+_TF_5M   = TimeFrame(amount=5, unit=TimeFrameUnit.Minute)  # pyright: ignore[reportArgumentType]
+
+# Symbols per request by bar density — intraday responses are far larger,
+# so smaller chunks keep each request to fewer pages. Keyed by
+# `TimeFrame.value` since TimeFrame does not hash by value.
+_MAX_SYMBOLS_PER_TF = {
+    _TF_DAY.value: 200,
+    _TF_WEEK.value: 200,
+    _TF_HOUR.value: 150,
+    _TF_15M.value: 100,
+    _TF_5M.value: 60,
+}
+
+_UNIT_DURATION = {
+    TimeFrameUnit.Minute: timedelta(minutes=1),
+    TimeFrameUnit.Hour: timedelta(hours=1),
+    TimeFrameUnit.Day: timedelta(days=1),
+    TimeFrameUnit.Week: timedelta(weeks=1),
+}
+
 
 # -------------------------
 # Client (singleton)
 # -------------------------
 
 _client: Optional[StockHistoricalDataClient] = None
+_client_lock = threading.Lock()
+
+
+def check_credentials() -> None:
+    """Raise a clear error if the Alpaca API keys aren't configured."""
+    missing = [
+        name for name, value in (
+            ("ALPACA_API_KEY", ALPACA_API_KEY),
+            ("ALPACA_SECRET_KEY", ALPACA_SECRET_KEY),
+        )
+        if not value
+    ]
+    if missing:
+        raise RuntimeError(
+            f"Missing Alpaca credentials: {', '.join(missing)}. "
+            "Set them in the environment or a .env file."
+        )
 
 
 def get_client() -> StockHistoricalDataClient:
     global _client
     if _client is None:
-        _client = StockHistoricalDataClient(
-            os.environ["ALPACA_API_KEY"],
-            os.environ["ALPACA_SECRET_KEY"],
-        )
+        check_credentials()
+        # Batches may be fetched from worker threads — only build one client
+        with _client_lock:
+            if _client is None:
+                _client = StockHistoricalDataClient(ALPACA_API_KEY, ALPACA_SECRET_KEY)
     return _client
 
 
@@ -61,56 +144,257 @@ def _chunked(lst: List[str], size: int):
         yield lst[i : i + size]
 
 
-def _fetch_bars(
+def _downcast(df: pd.DataFrame) -> pd.DataFrame:
+    """Cast OHLCV to BAR_DTYPES (volume stays 64-bit if it would overflow)."""
+    dtypes = dict(BAR_DTYPES)
+    if df["volume"].max() > UINT32_MAX:
+        dtypes["volume"] = "uint64"
+    return df.astype(dtypes)
+
+
+def _bar_duration(timeframe: TimeFrame) -> timedelta:
+    """Wall-clock length of one bar for the given timeframe."""
+    return timeframe.amount_value * _UNIT_DURATION[timeframe.unit_value]
+
+
+def _last_market_activity(now: datetime) -> datetime:
+    """
+    Latest moment a new bar could have printed: `now` while a weekday
+    session is open, otherwise the close of the most recent session.
+    Holidays count as sessions — that only costs an unneeded refetch.
+    """
+    local = now.astimezone(MARKET_TZ)
+    day = local.date()
+
+    if local.weekday() < 5 and local.time() >= SESSION_OPEN:
+        if local.time() < SESSION_CLOSE:
+            return now
+        return datetime.combine(day, SESSION_CLOSE, tzinfo=MARKET_TZ)
+
+    # Pre-market or weekend — step back to the previous weekday's close
+    day -= timedelta(days=1)
+    while day.weekday() >= 5:
+        day -= timedelta(days=1)
+    return datetime.combine(day, SESSION_CLOSE, tzinfo=MARKET_TZ)
+
+
+def _cache_paths(symbol: str, timeframe: TimeFrame) -> Tuple[Path, Path]:
+    """Parquet file + JSON sidecar for a (symbol, timeframe) cache entry."""
+    tf_dir = CACHE_DIR / timeframe.value
+    return tf_dir / f"{symbol}.parquet", tf_dir / f"{symbol}.meta.json"
+
+
+def _read_cache(
+    symbol: str,
+    timeframe: TimeFrame,
+    start: datetime,
+    now: datetime,
+) -> Tuple[Optional[pd.DataFrame], Optional[datetime]]:
+    """
+    Load cached bars for a symbol and work out where the incremental
+    request should begin.
+    Returns (cached_df or None, fetch_start); fetch_start is None when the
+    cache is already current.
+    """
+    path, meta_path = _cache_paths(symbol, timeframe)
+    if not path.exists() or not meta_path.exists():
+        return None, start
+
+    try:
+        meta = json.loads(meta_path.read_text())
+        cache_start = datetime.fromisoformat(meta["start"])
+        fetched_at = datetime.fromisoformat(meta["fetched_at"])
+        if cache_start > start:
+            # Cache doesn't reach back far enough — refetch the whole window
+            return None, start
+        cached = pd.read_parquet(path)
+    except (OSError, ValueError, KeyError, TypeError, pa.ArrowException) as e:
+        # Truncated or corrupt entry — treat as a miss; the refetch rewrites it
+        logger.warning(f"{symbol}: unreadable {timeframe.value} cache ({e}) — refetching")
+        return None, start
+
+    if cached.empty:
+        return None, start
+
+    if fetched_at >= _last_market_activity(now):
+        # Market has been closed since this was cached — nothing new exists
+        return cached, None
+
+    last_ts = cast(pd.Timestamp, cached.index[-1]).to_pydatetime()
+
+    if fetched_at < last_ts + _bar_duration(timeframe):
+        # Last bar was still forming when it was cached — drop and refetch it
+        return cached.iloc[:-1], last_ts
+
+    return cached, last_ts + _bar_duration(timeframe)
+
+
+def _write_cache(
+    symbol: str,
+    timeframe: TimeFrame,
+    df: pd.DataFrame,
+    cache_start: datetime,
+    fetched_at: datetime,
+) -> None:
+    """
+    Replace a symbol's cache entry. Each file is written to a temp path and
+    moved into place; the sidecar is removed first and restored last, so an
+    interrupted write reads back as a cache miss, never as a stale pairing.
+    """
+    path, meta_path = _cache_paths(symbol, timeframe)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    meta_path.unlink(missing_ok=True)
+
+    tmp_path = path.with_name(path.name + ".tmp")
+    df.to_parquet(tmp_path, compression="zstd")
+    os.replace(tmp_path, path)
+
+    tmp_meta = meta_path.with_name(meta_path.name + ".tmp")
+    tmp_meta.write_text(json.dumps({
+        "fetched_at": fetched_at.isoformat(),
+        "start": cache_start.isoformat(),
+    }))
+    os.replace(tmp_meta, meta_path)
+
+
+def _request_bars(
     symbols: List[str],
     timeframe: TimeFrame,
     start: datetime,
     end: datetime,
-) -> Dict[str, pd.DataFrame]:
+) -> List[pa.Table]:
     """
-    Fetch bars for a list of symbols, chunking if needed.
-    Returns {symbol: DataFrame} with a DatetimeIndex on 'timestamp'.
+    Issue StockBarsRequests for a list of symbols, chunking if needed.
+    Returns the raw long-format bars (one row per symbol/timestamp) as
+    Arrow tables, one per non-empty response.
     """
     client = get_client()
-    symbols = _ensure_benchmark(symbols)
 
-    all_frames: List[pd.DataFrame] = []
+    tables: List[pa.Table] = []
+
+    max_symbols = _MAX_SYMBOLS_PER_TF.get(timeframe.value, MAX_SYMBOLS_PER_REQUEST)
 
-    for chunk in _chunked(symbols, MAX_SYMBOLS_PER_REQUEST):
+    for chunk in _chunked(symbols, max_symbols):
         request = StockBarsRequest(
             symbol_or_symbols=chunk,
             timeframe=timeframe,  # pyright: ignore[reportArgumentType]
             start=start,
             end=end,
             adjustment=Adjustment.RAW,
-            feed=DataFeed.IEX,
+            feed=FEED,
         )
+        # No explicit `limit`: the SDK treats it as a cap on total rows,
+        # and already pages at the 10k-per-page maximum without it
         bars = client.get_stock_bars(request)
-        df = cast(pd.DataFrame, bars.df).reset_index()  # pyright: ignore[reportAttributeAccessIssue]
-        all_frames.append(df)
+        df = cast(pd.DataFrame, bars.df)  # pyright: ignore[reportAttributeAccessIssue]
+        if df.empty:
+            continue
+        tables.append(pa.Table.from_pandas(df.reset_index(), preserve_index=False))
+
+    return tables
+
 
-    if not all_frames:
-        return {}
+def _split_by_symbol(table: pa.Table) -> Dict[str, pd.DataFrame]:
+    """
+    Split a long-format bar table into per-symbol DataFrames.
+    Sorting by (symbol, timestamp) makes each symbol a contiguous run, so
+    every group is a zero-copy slice converted to pandas on its own.
+    """
+    # Dictionary-encode symbols once so the sort and the run-length count
+    # work on int32 codes instead of hashing/comparing strings
+    encoded = pc.dictionary_encode(table["symbol"].combine_chunks())
+    table = (
+        table.append_column("_code", encoded.indices)
+             .sort_by([("_code", "ascending"), ("timestamp", "ascending")])
+             .drop_columns(["_code"])
+    )
+    counts = np.bincount(encoded.indices.to_numpy(), minlength=len(encoded.dictionary))
+
+    data: Dict[str, pd.DataFrame] = {}
+    offset = 0
+    for symbol, count in zip(encoded.dictionary.to_pylist(), counts):
+        sym_df = table.slice(offset, count).to_pandas()
+        data[symbol] = sym_df.set_index("timestamp")
+        offset += count
+
+    return data
+
+
+def _fetch_bars(
+    symbols: List[str],
+    timeframe: TimeFrame,
+    start: datetime,
+    end: datetime,
+) -> Dict[str, pd.DataFrame]:
+    """
+    Fetch bars for a list of symbols, serving what we can from the
+    on-disk cache and only requesting the missing tail from Alpaca.
+    Returns {symbol: DataFrame}, each indexed by 'timestamp'.
+    """
+    symbols = _ensure_benchmark(symbols)
+    fetched_at = datetime.now(timezone.utc)
 
-    df = pd.concat(all_frames, ignore_index=True)
+    cached: Dict[str, pd.DataFrame] = {}
+    # Symbols that need new bars, and where each one's gap begins
+    pending: Dict[str, datetime] = {}
+
+    for symbol in symbols:
+        sym_cached, fetch_start = _read_cache(symbol, timeframe, start, fetched_at)
+        if sym_cached is not None:
+            cached[symbol] = sym_cached
+        if fetch_start is not None and fetch_start < end:
+            pending[symbol] = fetch_start
+
+    tables: List[pa.Table] = []
+    if pending:
+        # One request from the earliest gap — last-bar timestamps differ
+        # per symbol, and a request per distinct start fans out into many
+        # sequential round-trips. Bars overlapping the cache are deduped
+        # in the merge below.
+        tables = _request_bars(list(pending), timeframe, min(pending.values()), end)
+    else:
+        logger.info(f"{timeframe.value}: cache is current for all symbols — no request")
+
+    fresh: Dict[str, pd.DataFrame] = {}
+    if tables:
+        # Chunked concat — no copy of the underlying column buffers
+        table = pa.concat_tables(tables, promote_options="permissive")
+
+        # Columns are identical across symbols, so validate once up front
+        missing = REQUIRED_COLUMNS - set(table.column_names)
+        if missing:
+            logger.warning(f"Bar response missing columns {missing} — ignoring new bars")
+        else:
+            fresh = _split_by_symbol(table)
 
     data: Dict[str, pd.DataFrame] = {}
 
     for symbol in symbols:
-        sym_df = df[df["symbol"] == symbol].copy()
+        sym_df = fresh.get(symbol, pd.DataFrame())
+
+        if symbol in cached:
+            sym_df = pd.concat([cached[symbol], sym_df]) if not sym_df.empty else cached[symbol]
+            sym_df = sym_df[~sym_df.index.duplicated(keep="last")]
+            # Fresh bars overlap the cached tail when the request began at
+            # another symbol's earlier gap; keeping the fresh copy leaves
+            # the merge in order unless a cached bar is missing from the
+            # response (or the cache was tampered with)
+            if not sym_df.index.is_monotonic_increasing:
+                sym_df = sym_df.sort_index(kind="mergesort")
+
+        # Trim to the requested window before caching, so 5m/15m entries
+        # don't grow by a session of bars every run
+        sym_df = sym_df[sym_df.index >= start] if not sym_df.empty else sym_df
+
+        if not sym_df.empty and symbol in pending:
+            sym_df = _downcast(sym_df)
+            _write_cache(symbol, timeframe, sym_df, start, fetched_at)
 
         if sym_df.empty:
             logger.warning(f"{symbol}: no bar data returned — skipping")
             continue
 
-        missing = REQUIRED_COLUMNS - set(sym_df.columns)
-        if missing:
-            logger.warning(f"{symbol}: missing columns {missing} — skipping")
-            continue
-
-        sym_df = sym_df.sort_values("timestamp")
-        sym_df.set_index("timestamp", inplace=True)
-        data[symbol] = sym_df
+        data[symbol] = sym_df.drop(columns="symbol", errors="ignore")
 
     return data
 
@@ -119,6 +403,22 @@ def _fetch_bars(
 # Public API
 # -------------------------
 
+def _get_batch(
+    symbols: List[str],
+    timeframe: TimeFrame,
+    lookback_days: float,
+    padding: float = 1.5,
+) -> Dict[str, pd.DataFrame]:
+    """
+    Fetch `lookback_days` worth of bars ending now.  The default 1.5x
+    padding turns trading days into calendar days so weekends/holidays
+    don't leave us short.
+    """
+    end = datetime.now(timezone.utc)
+    start = end - timedelta(days=int(lookback_days * padding))
+    return _fetch_bars(symbols=symbols, timeframe=timeframe, start=start, end=end)
+
+
 def get_daily_batch(
     symbols: List[str],
     trading_days: int = 60,
@@ -127,16 +427,7 @@ def get_daily_batch(
     Fetch daily bars.  `trading_days` is approximate — we pad with
     calendar days to make sure we have enough after weekends/holidays.
     """
-    end = datetime.now(timezone.utc)
-    # ~1.5x calendar days to cover weekends + holidays
-    start = end - timedelta(days=int(trading_days * 1.5))
-
-    return _fetch_bars(
-        symbols=symbols,
-        timeframe=TimeFrame(amount=1, unit=TimeFrameUnit.Day), # pyright: ignore[reportArgumentType]
-        start=start,
-        end=end,
-    )
+    return _get_batch(symbols, _TF_DAY, trading_days)
 
 
 def get_weekly_batch(
@@ -146,15 +437,7 @@ def get_weekly_batch(
     """
     Fetch weekly bars.  Alpaca supports TimeFrameUnit.Week natively.
     """
-    end = datetime.now(timezone.utc)
-    start = end - timedelta(weeks=weeks)
-
-    return _fetch_bars(
-        symbols=symbols,
-        timeframe=TimeFrame(amount=1, unit=TimeFrameUnit.Week), # pyright: ignore[reportArgumentType]
-        start=start,
-        end=end,
-    )
+    return _get_batch(symbols, _TF_WEEK, weeks * 7, padding=1.0)
 
 
 def get_hourly_batch(
@@ -165,15 +448,7 @@ def get_hourly_batch(
     Fetch 1-hour bars.
     ~6.5 bars per trading day, so 30 days ≈ 195 bars.
     """
-    end = datetime.now(timezone.utc)
-    start = end - timedelta(days=int(trading_days * 1.5))
-
-    return _fetch_bars(
-        symbols=symbols,
-        timeframe=TimeFrame(amount=1, unit=TimeFrameUnit.Hour),  # pyright: ignore[reportArgumentType]
-        start=start,
-        end=end,
-    )
+    return _get_batch(symbols, _TF_HOUR, trading_days)
 
 
 def get_15m_batch(
@@ -184,15 +459,7 @@ def get_15m_batch(
     Fetch 15-minute bars.
     ~26 bars per trading day, so 5 days ≈ 130 bars.
     """
-    end = datetime.now(timezone.utc)
-    start = end - timedelta(days=int(trading_days * 1.5))
-
-    return _fetch_bars(
-        symbols=symbols,
-        timeframe=TimeFrame(amount=15, unit=TimeFrameUnit.Minute),  # pyright: ignore[reportArgumentType]
-        start=start,
-        end=end,
-    )
+    return _get_batch(symbols, _TF_15M, trading_days)
 
 
 def get_5m_batch(
@@ -203,13 +470,4 @@ def get_5m_batch(
     Fetch 5-minute bars.
     ~78 bars per trading day, so 2 days ≈ 156 bars.
     """
-    end = datetime.now(timezone.utc)
-    start = end - timedelta(days=int(trading_days * 1.5))
-
-    return _fetch_bars(
-        symbols=symbols,
-        timeframe=TimeFrame(amount=5, unit=TimeFrameUnit.Minute),  # pyright: ignore[reportArgumentType]
-        start=start,
-        end=end,
-    )
-
+    return _get_batch(symbols, _TF_5M, trading_days)
@@ -1,29 +1,43 @@
+from dataclasses import dataclass
 from pathlib import Path
 from datetime import datetime, timezone
 import logging
 import uuid
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
 
 logger = logging.getLogger(__name__)
 
 # Directory structure:
 #   data/
 #   ├── scans/
-#   │   ├── stocks/
-#   │   └── sectors/
+#   │   ├── stocks/          stock_20260225_143022_a1b2c3d4.parquet
+#   │   └── sectors/         sector_20260225_143022_a1b2c3d4.parquet
 #   ├── spot/
 #   │   ├── universe/
-#   │   │   ├── spot_universe_20260225_143022_a1b2c3d4.csv
+#   │   │   ├── spot_universe_20260225_143022_a1b2c3d4.parquet
 #   │   │   └── ...
 #   │   └── singles/
-#   │       ├── NVDA_20260225_143022_a1b2c3d4.csv
+#   │       ├── NVDA_20260225.arrow      (Arrow IPC / Feather V2)
 #   │       └── ...
 #   ├── watchlists/
-#   │   ├── strong/
-#   │   └── weak/
+#   │   ├── strong/          strong_20260225.parquet
+#   │   └── weak/            weak_20260225.parquet
 #   ├── reports/
 #   └── logs/
+#
+# Fetched bars are cached separately under .cache/bars/{tf}/ as
+# {SYMBOL}.parquet + {SYMBOL}.meta.json — see data_ingestion.
+#
+# Scans are stored as zstd-compressed Parquet: typed columns, a fraction
+# of the CSV size, and no text parsing when reports read them back.
+# Older CSV scans are still picked up by the reports. Single-symbol spot
+# logs are rewritten on every append, so they use Arrow IPC (Feather V2),
+# the cheapest format to read back and write out again.
 
 BASE_DIR     = Path("data")
 STOCK_DIR    = BASE_DIR / "scans" / "stocks"
@@ -41,42 +55,117 @@ SCAN_DIRS = {
     "sector": SECTOR_DIR,
 }
 
+PARQUET_COMPRESSION = "zstd"
+
+
+@dataclass(frozen=True)
+class ScanContext:
+    """
+    Stamps identifying one run. Pass the same context to every logger
+    call in a run so all its output files share one scan_uuid.
+    Dates and timestamps are naive UTC datetimes, stored as typed columns.
+    """
+    scan_date: datetime
+    scan_timestamp: datetime
+    scan_uuid: str
+    model_version: str = MODEL_VERSION
+
+    @classmethod
+    def now(cls) -> "ScanContext":
+        now = datetime.now(timezone.utc).replace(tzinfo=None, microsecond=0)
+        return cls(
+            scan_date=now.replace(hour=0, minute=0, second=0),
+            scan_timestamp=now,
+            scan_uuid=uuid.uuid4().hex[:8],
+        )
+
+    @property
+    def date_tag(self) -> str:
+        """scan_date as used in file names."""
+        return self.scan_date.strftime("%Y%m%d")
+
+    @property
+    def timestamp_tag(self) -> str:
+        """scan_timestamp as used in file names."""
+        return self.scan_timestamp.strftime("%Y%m%d_%H%M%S")
+
+
+# Directories already created this process — later calls skip the syscalls
+_DIRS_READY: set[Path] = set()
+
+
+def ensure_dir(path: Path) -> None:
+    """mkdir -p, once per directory per process."""
+    if path not in _DIRS_READY:
+        path.mkdir(parents=True, exist_ok=True)
+        _DIRS_READY.add(path)
+
+
+def _append_parquet(table: pa.Table, path: Path) -> None:
+    """
+    Append rows to a small daily Parquet file.
+    Parquet files can't be appended in place, so the existing rows are
+    read back and the file rewritten — these files hold a few rows per run,
+    so this stays in Arrow rather than round-tripping through pandas.
+    """
+    if path.exists():
+        table = pa.concat_tables(
+            [pq.read_table(path), table], promote_options="permissive"
+        )
+    pq.write_table(table, path, compression=PARQUET_COMPRESSION)
+
+
+def _append_feather(table: pa.Table, path: Path) -> None:
+    """Append rows to a per-symbol daily Arrow IPC (Feather V2) file."""
+    if path.exists():
+        table = pa.concat_tables(
+            [feather.read_table(path), table], promote_options="permissive"
+        )
+    feather.write_feather(table, path)
+
+
+def _label(n: int, value):
+    """
+    Broadcast a run-constant value to `n` rows. Strings become a
+    one-category Categorical — an int8 code per row in memory and a single
+    dictionary entry in Parquet — instead of `n` Python string objects.
+    """
+    if isinstance(value, str):
+        return pd.Categorical.from_codes(np.zeros(n, dtype=np.int8), [value])
+    return value
+
 
 def log_scan(
     df: pd.DataFrame,
     scan_type: str = "stock",
     metadata: dict | None = None,
+    ctx: ScanContext | None = None,
 ) -> Path:
     """
-    Write scan results to CSV in the appropriate subdirectory.
+    Write scan results to Parquet in the appropriate subdirectory.
     """
-    df = df.copy()
-
     scan_dir = SCAN_DIRS.get(scan_type)
     if scan_dir is None:
         raise ValueError(f"Unknown scan_type: {scan_type}. Use 'stock' or 'sector'.")
 
-    scan_dir.mkdir(parents=True, exist_ok=True)
-
-    now = datetime.now(timezone.utc)
-    scan_date = now.strftime("%Y%m%d")
-    scan_timestamp = now.strftime("%Y%m%d_%H%M%S")
-    scan_uuid = uuid.uuid4().hex[:8]
-
-    df["scan_uuid"] = scan_uuid
-    df["scan_date"] = scan_date
-    df["scan_timestamp"] = scan_timestamp
-    df["scan_type"] = scan_type
-    df["model_version"] = MODEL_VERSION
+    ensure_dir(scan_dir)
 
-    if metadata:
-        for key, value in metadata.items():
-            df[f"meta_{key}"] = value
+    ctx = ctx or ScanContext.now()
 
-    df = df.sort_values("composite_score", ascending=False)
+    # assign returns a new frame — the caller's df is left untouched
+    # without a defensive copy of every column up front
+    n = len(df)
+    df = df.assign(
+        scan_uuid=_label(n, ctx.scan_uuid),
+        scan_date=ctx.scan_date,
+        scan_timestamp=ctx.scan_timestamp,
+        scan_type=_label(n, scan_type),
+        model_version=_label(n, ctx.model_version),
+        **{f"meta_{key}": _label(n, value) for key, value in (metadata or {}).items()},
+    )
 
-    filename = scan_dir / f"{scan_type}_{scan_timestamp}_{scan_uuid}.csv"
-    df.to_csv(filename, index=False)
+    filename = scan_dir / f"{scan_type}_{ctx.timestamp_tag}_{ctx.scan_uuid}.parquet"
+    df.to_parquet(filename, index=False, compression=PARQUET_COMPRESSION)
 
     logger.info(f"Logged {scan_type} scan → {filename}")
     return filename
@@ -86,19 +175,15 @@ def log_watchlists(
     df: pd.DataFrame,
     n: int = 10,
     metadata: dict | None = None,
+    ctx: ScanContext | None = None,
 ) -> tuple[Path, Path]:
     """
     Log the top N strongest and weakest stocks to separate daily files.
     """
-    STRONG_DIR.mkdir(parents=True, exist_ok=True)
-    WEAK_DIR.mkdir(parents=True, exist_ok=True)
-
-    now = datetime.now(timezone.utc)
-    scan_date = now.strftime("%Y%m%d")
-    scan_timestamp = now.strftime("%Y%m%d_%H%M%S")
-    scan_uuid = uuid.uuid4().hex[:8]
+    ensure_dir(STRONG_DIR)
+    ensure_dir(WEAK_DIR)
 
-    sorted_df = df.sort_values("composite_score", ascending=False)
+    ctx = ctx or ScanContext.now()
 
     watchlist_cols = [
         "symbol", "sector",
@@ -113,45 +198,30 @@ def log_watchlists(
     if "hourly_score" in df.columns:
         watchlist_cols.append("hourly_score")
 
-    watchlist_cols = [c for c in watchlist_cols if c in sorted_df.columns]
-
-    strong = sorted_df.head(n)[watchlist_cols].copy()
-    strong["rank"] = range(1, len(strong) + 1)
-    strong["list"] = "strong"
-    strong["scan_date"] = scan_date
-    strong["scan_timestamp"] = scan_timestamp
-    strong["scan_uuid"] = scan_uuid
-    strong["model_version"] = MODEL_VERSION
-    if metadata:
-        for key, value in metadata.items():
-            strong[f"meta_{key}"] = value
-
-    weak = sorted_df.tail(n)[watchlist_cols].copy()
-    weak["rank"] = range(1, len(weak) + 1)
-    weak["list"] = "weak"
-    weak["scan_date"] = scan_date
-    weak["scan_timestamp"] = scan_timestamp
-    weak["scan_uuid"] = scan_uuid
-    weak["model_version"] = MODEL_VERSION
-    if metadata:
-        for key, value in metadata.items():
-            weak[f"meta_{key}"] = value
-
-    strong_path = STRONG_DIR / f"strong_{scan_date}.csv"
-    weak_path = WEAK_DIR / f"weak_{scan_date}.csv"
-
-    strong.to_csv(
-        strong_path,
-        mode="a",
-        header=not strong_path.exists(),
-        index=False,
-    )
-    weak.to_csv(
-        weak_path,
-        mode="a",
-        header=not weak_path.exists(),
-        index=False,
-    )
+    watchlist_cols = [c for c in watchlist_cols if c in df.columns]
+
+    # Per-run columns, added to each list in one assign
+    stamps = {
+        "scan_date": ctx.scan_date,
+        "scan_timestamp": ctx.scan_timestamp,
+        "scan_uuid": ctx.scan_uuid,
+        "model_version": ctx.model_version,
+        **{f"meta_{key}": value for key, value in (metadata or {}).items()},
+    }
+
+    # Partial selection instead of sorting the whole universe
+    strong = df.nlargest(n, "composite_score")[watchlist_cols]
+    strong = strong.assign(rank=np.arange(1, len(strong) + 1), list="strong", **stamps)
+
+    # Same order as the tail of a descending sort — weakest ranked last
+    weak = df.nsmallest(n, "composite_score").iloc[::-1][watchlist_cols]
+    weak = weak.assign(rank=np.arange(1, len(weak) + 1), list="weak", **stamps)
+
+    strong_path = STRONG_DIR / f"strong_{ctx.date_tag}.parquet"
+    weak_path = WEAK_DIR / f"weak_{ctx.date_tag}.parquet"
+
+    _append_parquet(pa.Table.from_pandas(strong, preserve_index=False), strong_path)
+    _append_parquet(pa.Table.from_pandas(weak, preserve_index=False), weak_path)
 
     logger.info(f"Logged top {n} strong → {strong_path}")
     logger.info(f"Logged top {n} weak   → {weak_path}")
@@ -162,31 +232,27 @@ def log_watchlists(
 def log_spot_universe(
     df: pd.DataFrame,
     metadata: dict | None = None,
+    ctx: ScanContext | None = None,
 ) -> Path:
     """
     Log a full universe spot scan.
     One file per run, timestamped.
     """
-    SPOT_UNI_DIR.mkdir(parents=True, exist_ok=True)
-
-    df = df.copy()
-
-    now = datetime.now(timezone.utc)
-    scan_date = now.strftime("%Y%m%d")
-    scan_timestamp = now.strftime("%Y%m%d_%H%M%S")
-    scan_uuid = uuid.uuid4().hex[:8]
+    ensure_dir(SPOT_UNI_DIR)
 
-    df["scan_date"] = scan_date
-    df["scan_timestamp"] = scan_timestamp
-    df["scan_uuid"] = scan_uuid
-    df["model_version"] = MODEL_VERSION
+    ctx = ctx or ScanContext.now()
 
-    if metadata:
-        for key, value in metadata.items():
-            df[f"meta_{key}"] = value
+    n = len(df)
+    df = df.assign(
+        scan_date=ctx.scan_date,
+        scan_timestamp=ctx.scan_timestamp,
+        scan_uuid=_label(n, ctx.scan_uuid),
+        model_version=_label(n, ctx.model_version),
+        **{f"meta_{key}": _label(n, value) for key, value in (metadata or {}).items()},
+    )
 
-    filename = SPOT_UNI_DIR / f"spot_universe_{scan_timestamp}_{scan_uuid}.csv"
-    df.to_csv(filename, index=False)
+    filename = SPOT_UNI_DIR / f"spot_universe_{ctx.timestamp_tag}_{ctx.scan_uuid}.parquet"
+    df.to_parquet(filename, index=False, compression=PARQUET_COMPRESSION)
 
     logger.info(f"Logged spot universe scan → {filename}")
     return filename
@@ -195,39 +261,49 @@ def log_spot_universe(
 def log_spot_single(
     result: dict,
     metadata: dict | None = None,
+    ctx: ScanContext | None = None,
 ) -> Path:
     """
     Log a single-symbol spot scan.
     Appends to a per-symbol daily file so you can track intraday changes.
     """
-    SPOT_SYM_DIR.mkdir(parents=True, exist_ok=True)
+    return log_spot_single_batch([result], metadata, ctx)[0]
+
+
+def log_spot_single_batch(
+    results: list[dict],
+    metadata: dict | None = None,
+    ctx: ScanContext | None = None,
+) -> list[Path]:
+    """
+    Log several single-symbol spot scans from one run.
+    Stamps are computed once and each symbol's daily file is rewritten
+    once, however many of its results are in the batch.
+    """
+    ensure_dir(SPOT_SYM_DIR)
 
-    now = datetime.now(timezone.utc)
-    scan_date = now.strftime("%Y%m%d")
-    scan_timestamp = now.strftime("%Y%m%d_%H%M%S")
-    scan_uuid = uuid.uuid4().hex[:8]
+    ctx = ctx or ScanContext.now()
 
-    row = {**result}
-    row["scan_date"] = scan_date
-    row["scan_timestamp"] = scan_timestamp
-    row["scan_uuid"] = scan_uuid
-    row["model_version"] = MODEL_VERSION
+    stamps = {
+        "scan_date": ctx.scan_date,
+        "scan_timestamp": ctx.scan_timestamp,
+        "scan_uuid": ctx.scan_uuid,
+        "model_version": ctx.model_version,
+        **{f"meta_{key}": value for key, value in (metadata or {}).items()},
+    }
 
-    if metadata:
-        for key, value in metadata.items():
-            row[f"meta_{key}"] = value
+    by_symbol: dict[str, list[dict]] = {}
+    for result in results:
+        by_symbol.setdefault(result["symbol"], []).append({**result, **stamps})
 
-    df = pd.DataFrame([row])
+    paths = []
+    for symbol, rows in by_symbol.items():
+        filename = SPOT_SYM_DIR / f"{symbol}_{ctx.date_tag}.arrow"
 
-    symbol = result["symbol"]
-    filename = SPOT_SYM_DIR / f"{symbol}_{scan_date}.csv"
+        # A few rows — build the Arrow table directly, no DataFrame needed
+        _append_feather(pa.Table.from_pylist(rows), filename)
 
-    df.to_csv(
-        filename,
-        mode="a",
-        header=not filename.exists(),
-        index=False,
-    )
+        logger.info(f"Logged spot scan for {symbol} → {filename}")
+        paths.append(filename)
 
-    logger.info(f"Logged spot scan for {symbol} → {filename}")
-    return filename
\ No newline at end of file
+    return paths
@@ -3,30 +3,182 @@ Reporting layer — reads historical scans and produces
 trend / tracking reports for the 30-session research phase.
 """
 
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
 import logging
+import os
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
 
-from src.utils.logger import STOCK_DIR, SECTOR_DIR, REPORT_DIR, STRONG_DIR, WEAK_DIR
+from src.utils.logger import STOCK_DIR, SECTOR_DIR, REPORT_DIR, STRONG_DIR, WEAK_DIR, ensure_dir
 
 logger = logging.getLogger(__name__)
 
 
-def _load_all_scans(scan_dir: Path) -> pd.DataFrame:
-    """Load all CSV files in a scan directory into one DataFrame."""
-    files = sorted(scan_dir.glob("*.csv"))
-    if not files:
-        logger.warning(f"No scan files found in {scan_dir}")
+# Columns each report reads — everything else is skipped on load
+SCORE_COLUMNS = ["symbol", "scan_date", "scan_timestamp", "composite_score"]
+TRACKER_COLUMNS = SCORE_COLUMNS + [
+    "sector",
+    "weekly_score", "weekly_bias",
+    "daily_score", "daily_bias",
+    "hourly_score", "hourly_bias",
+    "aligned",
+]
+FREQUENCY_COLUMNS = SCORE_COLUMNS + ["rank", "sector"]
+
+# Legacy CSV scans: read the stamps as text and parse them with their
+# exact formats (an all-digit uuid or date would otherwise be inferred
+# as an integer)
+_CSV_CONVERT = pacsv.ConvertOptions(
+    column_types={
+        "scan_date": pa.string(),
+        "scan_timestamp": pa.string(),
+        "scan_uuid": pa.string(),
+    }
+)
+
+# Text formats of the stamps in scans logged before they were typed
+_STAMP_FORMATS = {"scan_date": "%Y%m%d", "scan_timestamp": "%Y%m%d_%H%M%S"}
+
+
+def _has_text_stamps(schema: pa.Schema) -> bool:
+    return "scan_date" in schema.names and not pa.types.is_timestamp(
+        schema.field("scan_date").type
+    )
+
+
+def _parse_stamps(table: pa.Table) -> pa.Table:
+    """Parse text scan_date / scan_timestamp columns into timestamps."""
+    for name, fmt in _STAMP_FORMATS.items():
+        if name in table.column_names and not pa.types.is_timestamp(table.schema.field(name).type):
+            i = table.schema.get_field_index(name)
+            table = table.set_column(i, name, pc.strptime(table[name], format=fmt, unit="us"))
+    return table
+
+
+def _decode_dictionaries(schema: pa.Schema) -> pa.Schema:
+    """Swap dictionary fields for their value type; drop pandas metadata."""
+    return pa.schema([
+        field.with_type(field.type.value_type)
+        if pa.types.is_dictionary(field.type) else field
+        for field in schema
+    ])
+
+
+def _load_all_scans(
+    scan_dir: Path,
+    columns: list[str] | None = None,
+    since_ns: int = 0,
+) -> pd.DataFrame:
+    """
+    Load all scan files in a scan directory into one DataFrame.
+    Only `columns` are read (those a file lacks are skipped), and with
+    `since_ns` only files modified after that mtime.
+    Memoized on the file list and newest mtime, so running several
+    reports in one session reads each directory once. Callers must not
+    mutate the returned frame.
+    """
+    parquet_files: list[str] = []
+    csv_files: list[str] = []
+    newest = 0
+
+    # One directory read; DirEntry carries the name and a cached stat,
+    # so no Path objects or per-file pattern matching
+    try:
+        with os.scandir(scan_dir) as entries:
+            for entry in entries:
+                if not entry.is_file(follow_symlinks=False):
+                    continue
+                if not entry.name.endswith((".parquet", ".csv")):
+                    continue
+                mtime = entry.stat().st_mtime_ns
+                if mtime <= since_ns:
+                    continue
+                if entry.name.endswith(".parquet"):
+                    parquet_files.append(entry.path)
+                else:
+                    csv_files.append(entry.path)
+                newest = max(newest, mtime)
+    except FileNotFoundError:
+        pass
+
+    if not parquet_files and not csv_files:
+        if not since_ns:
+            logger.warning(f"No scan files found in {scan_dir}")
         return pd.DataFrame()
 
-    dfs = [pd.read_csv(f) for f in files]
-    combined = pd.concat(dfs, ignore_index=True)
+    return _load_scans_cached(
+        tuple(sorted(parquet_files)),
+        tuple(sorted(csv_files)),
+        newest,
+        tuple(columns) if columns is not None else None,
+    )
+
+
+@lru_cache(maxsize=4)
+def _load_scans_cached(
+    parquet_files: tuple[str, ...],
+    csv_files: tuple[str, ...],
+    newest_mtime: int,
+    columns: tuple[str, ...] | None,
+) -> pd.DataFrame:
+    """Read the given scan files; `newest_mtime` only keys the cache."""
+
+    def _project(names: list[str]) -> list[str]:
+        return names if columns is None else [c for c in columns if c in names]
+
+    def _read_csv(path: str) -> pa.Table:
+        # Headers vary between legacy files, so parse whole, project after
+        table = pacsv.read_csv(path, convert_options=_CSV_CONVERT)
+        return _parse_stamps(table.select(_project(table.column_names)))
+
+    # CSVs predate the switch to Parquet, so they go first. Each read is
+    # I/O plus GIL-free parsing, so they overlap well across threads.
+    tables: list[pa.Table] = []
+    if csv_files:
+        with ThreadPoolExecutor(max_workers=min(8, len(csv_files))) as pool:
+            tables = list(pool.map(_read_csv, csv_files))
+
+    # Label columns are written dictionary-encoded; decode them while
+    # combining so dictionary, plain and CSV files all unify, then
+    # re-encode once so they come back as Categoricals
+    schemas = {f: pq.read_schema(f) for f in parquet_files}
+    labels = {
+        field.name
+        for schema in schemas.values()
+        for field in schema
+        if pa.types.is_dictionary(field.type)
+    }
+
+    # Older Parquet scans carry text stamps, which can't share a schema
+    # with typed ones — scan each kind separately
+    for text_stamps in (True, False):
+        group = [f for f in parquet_files if _has_text_stamps(schemas[f]) == text_stamps]
+        if not group:
+            continue
 
-    if "scan_date" in combined.columns:
-        combined["scan_date"] = pd.to_datetime(combined["scan_date"], format="%Y%m%d")
+        # Columns vary between scans (hourly on/off, metadata keys), so
+        # scan every file under the union of their footer schemas
+        schema = pa.unify_schemas(
+            [_decode_dictionaries(schemas[f]) for f in group],
+            promote_options="permissive",
+        )
+        dataset = ds.dataset(group, schema=schema, format="parquet")
+        # Column chunks outside the projection are never read
+        tables.append(_parse_stamps(dataset.to_table(columns=_project(schema.names))))
 
-    return combined
+    table = pa.concat_tables(tables, promote_options="permissive")
+    for name in labels & set(table.column_names):
+        i = table.schema.get_field_index(name)
+        table = table.set_column(i, name, pc.dictionary_encode(table[name]))
+    return table.to_pandas()
 
 
 def _latest_per_day(df: pd.DataFrame) -> pd.DataFrame:
@@ -37,11 +189,64 @@ def _latest_per_day(df: pd.DataFrame) -> pd.DataFrame:
     if df.empty:
         return df
     return (
-        df.sort_values("scan_timestamp")
-          .groupby(["symbol", "scan_date"])
-          .last()
-          .reset_index()
+        df.sort_values(["symbol", "scan_date", "scan_timestamp"], kind="mergesort")
+          .drop_duplicates(subset=["symbol", "scan_date"], keep="last")
+          .reset_index(drop=True)
+    )
+
+
+def _read_score_report(path: Path) -> pd.DataFrame:
+    """
+    Read the scores back from a previous pivot report — either flat, or
+    with ("score", symbol) / ("rank", symbol) columns. Older flat trend
+    reports carry "<symbol>_rank" columns, which are dropped.
+    """
+    with path.open() as f:
+        two_level = f.readline().startswith(",score")
+
+    if two_level:
+        report = pd.read_csv(
+            path, header=[0, 1], index_col=0, parse_dates=True,
+            float_precision="round_trip",
+        )
+        scores = report["score"]
+    else:
+        scores = pd.read_csv(
+            path, index_col="scan_date", parse_dates=["scan_date"],
+            float_precision="round_trip",
+        )
+        scores = scores.drop(columns=[c for c in scores.columns if c.endswith("_rank")])
+
+    scores.index.name = "scan_date"
+    scores.columns.name = "symbol"
+    return scores
+
+
+def _score_pivot(scan_dir: Path, out_path: Path) -> pd.DataFrame:
+    """
+    Pivot: rows = scan_date, columns = symbol, values = composite_score.
+    If `out_path` holds a previous report, only scans written since are
+    read and merged over it — newer scans win for the days they cover.
+    """
+    since_ns = out_path.stat().st_mtime_ns if out_path.exists() else 0
+
+    prev = _read_score_report(out_path) if since_ns else None
+
+    raw = _load_all_scans(scan_dir, SCORE_COLUMNS, since_ns)
+    if raw.empty:
+        return prev if prev is not None else pd.DataFrame()
+
+    # _latest_per_day leaves one row per (symbol, scan_date), so a plain
+    # reshape is enough — no grouping or aggregation
+    pivot = _latest_per_day(raw).pivot(
+        index="scan_date",
+        columns="symbol",
+        values="composite_score",
     )
+    if prev is not None:
+        pivot = pivot.combine_first(prev)
+
+    return pivot.sort_index()
 
 
 # -------------------------
@@ -53,30 +258,20 @@ def sector_trend_report() -> pd.DataFrame:
     Pivot: rows = scan_date, columns = sector ETF, values = composite_score.
     Shows how sector scores evolve over the 30-session window.
     """
-    REPORT_DIR.mkdir(parents=True, exist_ok=True)
+    ensure_dir(REPORT_DIR)
+    out_path = REPORT_DIR / "sector_trend.csv"
 
-    raw = _load_all_scans(SECTOR_DIR)
-    if raw.empty:
+    pivot = _score_pivot(SECTOR_DIR, out_path)
+    if pivot.empty:
         logger.warning("No sector scans to report on.")
         return pd.DataFrame()
 
-    daily = _latest_per_day(raw)
+    # Rank per day (1 = strongest); report["score"] / report["rank"]
+    # select each half of the column layout
+    rank = pivot.rank(axis=1, ascending=False).astype("int16")
 
-    pivot = daily.pivot_table(
-        index="scan_date",
-        columns="symbol",
-        values="composite_score",
-        aggfunc="last",
-    )
-    pivot = pivot.sort_index()
+    report = pd.concat({"score": pivot, "rank": rank}, axis=1)
 
-    # Add rank columns (1 = strongest that day)
-    rank = pivot.rank(axis=1, ascending=False).astype(int)
-    rank.columns = [f"{c}_rank" for c in rank.columns]
-
-    report = pd.concat([pivot, rank], axis=1)
-
-    out_path = REPORT_DIR / "sector_trend.csv"
     report.to_csv(out_path)
     logger.info(f"Sector trend report → {out_path}")
 
@@ -92,54 +287,41 @@ def sector_change_report() -> pd.DataFrame:
     For each sector: latest score, score N days ago, delta, direction.
     Quick view of what's accelerating or decelerating.
     """
-    REPORT_DIR.mkdir(parents=True, exist_ok=True)
+    ensure_dir(REPORT_DIR)
 
-    raw = _load_all_scans(SECTOR_DIR)
+    raw = _load_all_scans(SECTOR_DIR, SCORE_COLUMNS)
     if raw.empty:
         return pd.DataFrame()
 
     daily = _latest_per_day(raw)
 
-    dates = sorted(daily["scan_date"].unique())
-    if len(dates) < 2:
+    # rows = scan_date, columns = symbol — every lookback is one row away
+    pivot = daily.pivot(
+        index="scan_date",
+        columns="symbol",
+        values="composite_score",
+    ).sort_index()
+
+    if len(pivot) < 2:
         logger.warning("Need at least 2 scan days for change report.")
         return pd.DataFrame()
 
-    latest_date = dates[-1]
-    results = []
-
-    for symbol in daily["symbol"].unique():
-        sym_data = daily[daily["symbol"] == symbol].sort_values("scan_date")
-
-        latest = sym_data[sym_data["scan_date"] == latest_date]
-        if latest.empty:
-            continue
-
-        latest_score = latest["composite_score"].iloc[0]
-
-        # 1-day change
-        if len(dates) >= 2:
-            prev = sym_data[sym_data["scan_date"] == dates[-2]]
-            delta_1d = latest_score - prev["composite_score"].iloc[0] if not prev.empty else None
-        else:
-            delta_1d = None
-
-        # 5-day change (if available)
-        if len(dates) >= 5:
-            prev5 = sym_data[sym_data["scan_date"] == dates[-5]]
-            delta_5d = latest_score - prev5["composite_score"].iloc[0] if not prev5.empty else None
-        else:
-            delta_5d = None
-
-        results.append({
-            "symbol": symbol,
-            "latest_score": latest_score,
-            "delta_1d": delta_1d,
-            "delta_5d": delta_5d,
-            "direction": "▲" if delta_1d and delta_1d > 0 else ("▼" if delta_1d and delta_1d < 0 else "—"),
-        })
-
-    df = pd.DataFrame(results).sort_values("latest_score", ascending=False).reset_index(drop=True)
+    # Only symbols scanned on the latest date
+    latest = pivot.iloc[-1].dropna()
+    delta_1d = latest - pivot.iloc[-2].reindex(latest.index)
+    if len(pivot) >= 5:
+        delta_5d = latest - pivot.iloc[-5].reindex(latest.index)
+    else:
+        delta_5d = pd.Series(np.nan, index=latest.index)
+
+    df = pd.DataFrame({
+        "symbol": latest.index,
+        "latest_score": latest.to_numpy(),
+        "delta_1d": delta_1d.to_numpy(),
+        "delta_5d": delta_5d.to_numpy(),
+        "direction": np.select([delta_1d > 0, delta_1d < 0], ["▲", "▼"], default="—"),
+    })
+    df = df.sort_values("latest_score", ascending=False).reset_index(drop=True)
 
     out_path = REPORT_DIR / "sector_changes.csv"
     df.to_csv(out_path, index=False)
@@ -157,9 +339,9 @@ def stock_tracker_report(symbol: str) -> pd.DataFrame:
     Full history for a single stock across all scans.
     Shows score evolution, bias changes, alignment shifts.
     """
-    REPORT_DIR.mkdir(parents=True, exist_ok=True)
+    ensure_dir(REPORT_DIR)
 
-    raw = _load_all_scans(STOCK_DIR)
+    raw = _load_all_scans(STOCK_DIR, TRACKER_COLUMNS)
     if raw.empty:
         return pd.DataFrame()
 
@@ -201,23 +383,13 @@ def stock_ranking_report() -> pd.DataFrame:
     Pivot: rows = scan_date, columns = symbol, values = composite_score.
     Wide-format view of the entire universe over time.
     """
-    REPORT_DIR.mkdir(parents=True, exist_ok=True)
+    ensure_dir(REPORT_DIR)
+    out_path = REPORT_DIR / "stock_ranking_history.csv"
 
-    raw = _load_all_scans(STOCK_DIR)
-    if raw.empty:
+    pivot = _score_pivot(STOCK_DIR, out_path)
+    if pivot.empty:
         return pd.DataFrame()
 
-    daily = _latest_per_day(raw)
-
-    pivot = daily.pivot_table(
-        index="scan_date",
-        columns="symbol",
-        values="composite_score",
-        aggfunc="last",
-    )
-    pivot = pivot.sort_index()
-
-    out_path = REPORT_DIR / "stock_ranking_history.csv"
     pivot.to_csv(out_path)
     logger.info(f"Stock ranking history → {out_path}")
 
@@ -236,7 +408,7 @@ def watchlist_frequency_report(n: int = 10) -> tuple[pd.DataFrame, pd.DataFrame]
     -------
     (strong_freq, weak_freq) — DataFrames sorted by appearance count.
     """
-    REPORT_DIR.mkdir(parents=True, exist_ok=True)
+    ensure_dir(REPORT_DIR)
 
     strong_freq = _build_frequency("strong", STRONG_DIR, n)
     weak_freq   = _build_frequency("weak", WEAK_DIR, n)
@@ -247,7 +419,7 @@ def watchlist_frequency_report(n: int = 10) -> tuple[pd.DataFrame, pd.DataFrame]
 def _build_frequency(list_type: str, scan_dir: Path, n: int) -> pd.DataFrame:
     """Build frequency + consistency stats for a watchlist type."""
 
-    raw = _load_all_scans(scan_dir)
+    raw = _load_all_scans(scan_dir, FREQUENCY_COLUMNS)
     if raw.empty:
         logger.warning(f"No {list_type} watchlist files found.")
         return pd.DataFrame()
@@ -339,17 +511,11 @@ def _compute_streaks(daily: pd.DataFrame) -> pd.DataFrame:
     For each symbol, compute how many consecutive recent scan days
     it has appeared on the list (current streak).
     """
-    dates = sorted(daily["scan_date"].unique(), reverse=True)
-    streak_data = []
-
-    for symbol in daily["symbol"].unique():
-        sym_dates = set(daily[daily["symbol"] == symbol]["scan_date"])
-        streak = 0
-        for d in dates:
-            if d in sym_dates:
-                streak += 1
-            else:
-                break
-        streak_data.append({"symbol": symbol, "current_streak": streak})
-
-    return pd.DataFrame(streak_data)
\ No newline at end of file
+    # symbol x scan_date presence, newest date first
+    presence = pd.crosstab(daily["symbol"], daily["scan_date"]).sort_index(axis=1) > 0
+    recent_first = presence.to_numpy()[:, ::-1]
+
+    # Streak = run of days on the list before the first miss
+    streaks = np.cumprod(recent_first, axis=1).sum(axis=1)
+
+    return pd.DataFrame({"symbol": presence.index, "current_streak": streaks})
@@ -1,6 +1,11 @@
 # MODEL v1.3 — z-score normalized components
 
+from functools import lru_cache
+
 from src.models.sector_map import SECTOR_MAP
+from src.utils._njit import HAS_NUMBA
+from src.utils._rs_kernels import compute_all
+from src.utils.universe import UniverseTF
 import numpy as np
 import pandas as pd
 import logging
@@ -11,68 +16,43 @@ logger = logging.getLogger(__name__)
 # Helpers
 # -------------------------
 
-def compute_slope(series: pd.Series, lookback: int) -> float:
-    """Log-linear slope over lookback bars."""
-    if len(series) < lookback:
-        return np.nan
-    y = np.log(series.iloc[-lookback:].to_numpy(dtype=float))
-    x = np.arange(len(y), dtype=float)
-    slope = np.polyfit(x, y, 1)[0]
-    return float(slope)
-
-
-def compute_relative_strength(stock_close: pd.Series,
-                              bench_close: pd.Series,
-                              lookback: int) -> float:
-    """Log-return of stock minus log-return of benchmark."""
-    if len(stock_close) < lookback or len(bench_close) < lookback:
-        return np.nan
-    stock_ret = np.log(stock_close.iloc[-1]) - np.log(stock_close.iloc[-lookback])
-    bench_ret = np.log(bench_close.iloc[-1]) - np.log(bench_close.iloc[-lookback])
-    return stock_ret - bench_ret
-
-
-def compute_relative_volume(volume: pd.Series, lookback: int) -> float:
-    """Current bar volume / average volume over lookback. >1 = above-average."""
-    if len(volume) < lookback:
-        return np.nan
-    avg_vol = volume.iloc[-lookback:].mean()
-    if avg_vol == 0:
-        return np.nan
-    return float(volume.iloc[-1] / avg_vol)
+@lru_cache(maxsize=None)
+def _slope_weights(lookback: int) -> np.ndarray:
+    """
+    OLS slope weights for a `lookback`-bar window: (x - x_mean) / Σ(x - x_mean)².
+    The centred weights sum to zero, so slope = y @ weights with no need to
+    demean y. Only depends on the lookback, so it is built once per window size.
+    """
+    x = np.arange(lookback, dtype=np.float64) - (lookback - 1) / 2.0
+    weights = x / (lookback * (lookback * lookback - 1) / 12.0)
+    weights.setflags(write=False)
+    return weights
 
 
-def compute_volatility_ratio(stock_close: pd.Series,
-                             bench_close: pd.Series,
-                             lookback: int) -> float:
+def _log_return_std(log_close: np.ndarray, lookback: int) -> float:
     """
-    Stock realized vol / benchmark realized vol.
-    <1 = stock is calmer than benchmark.
+    Sample std (ddof=1) of the last `lookback` bar-to-bar log returns,
+    from already-logged closes. NaN under 2 returns.
     """
-    if len(stock_close) < lookback or len(bench_close) < lookback:
+    returns = np.diff(log_close[-(lookback + 1):])
+    if len(returns) < 2:
         return np.nan
-    stock_log_returns = np.log(stock_close / stock_close.shift(1)).iloc[-lookback:] # pyright: ignore[reportAttributeAccessIssue]
-    bench_log_returns = np.log(bench_close / bench_close.shift(1)).iloc[-lookback:] # pyright: ignore[reportAttributeAccessIssue]
-    stock_vol = stock_log_returns.std()
-    bench_vol = bench_log_returns.std()
-    if bench_vol == 0:
-        return np.nan
-    return float(stock_vol / bench_vol)
-
+    return float(returns.std(ddof=1))
 
-def sign(x: float) -> int:
-    if pd.isna(x):
-        return 0
-    return 1 if x > 0 else (-1 if x < 0 else 0)
 
-
-def zscore(series: pd.Series) -> pd.Series:
-    """Z-score normalize a series. Returns 0 for NaN or zero-std."""
-    mean = series.mean()
-    std = series.std()
-    if std == 0 or pd.isna(std):
-        return pd.Series(0.0, index=series.index)
-    return (series - mean) / std
+def _zscore_columns(X: np.ndarray) -> np.ndarray:
+    """
+    Z-score each column of X, skipping NaNs (sample std, ddof=1).
+    Columns with zero or undefined std become all 0; otherwise NaNs stay NaN.
+    """
+    valid = ~np.isnan(X)
+    count = valid.sum(axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = np.where(valid, X, 0.0).sum(axis=0) / count
+        dev = np.where(valid, X - mean, 0.0)
+        std = np.sqrt((dev * dev).sum(axis=0) / (count - 1))
+        usable = std > 0
+        return np.where(usable, (X - mean) / np.where(usable, std, 1.0), 0.0)
 
 
 # -------------------------
@@ -84,57 +64,128 @@ W_RS      = 0.35
 W_RVOL    = 0.15
 W_VOL_ADJ = 0.15
 
+# Same order as the components stacked in _zscore_and_score
+COMPONENT_WEIGHTS = np.array([W_SLOPE, W_RS, W_RVOL, W_VOL_ADJ])
+
 W_WEEKLY  = 0.40
 W_DAILY   = 0.35
 W_HOURLY  = 0.25
 
+# Composite blend by the timeframes scored — weekly/daily only without hourly
+TF_WEIGHTS = {
+    ("weekly", "daily", "hourly"): np.array([W_WEEKLY, W_DAILY, W_HOURLY]),
+    ("weekly", "daily"):           np.array([0.55, 0.45]),
+}
+
 BENCHMARK = "SPY"
 
 
-def _collect_raw_components(stock_df: pd.DataFrame,
-                            bench_df: pd.DataFrame,
-                            slope_lb: int,
-                            rs_lb: int,
-                            rvol_lb: int,
-                            vol_lb: int) -> dict:
-    """Compute raw indicator values for a single symbol + timeframe."""
-    return {
-        "slope": compute_slope(stock_df["close"], slope_lb),
-        "rs": compute_relative_strength(stock_df["close"], bench_df["close"], rs_lb),
-        "rvol": compute_relative_volume(stock_df["volume"], rvol_lb),
-        "vol_ratio": compute_volatility_ratio(stock_df["close"], bench_df["close"], vol_lb),
-    }
+# (slope_lb, rs_lb, rvol_lb, vol_lb) per timeframe
+LOOKBACKS = {
+    "weekly": (4, 4, 4, 4),
+    "daily":  (5, 10, 10, 10),
+    "hourly": (10, 20, 20, 20),
+}
+
+
+def _window(slope_lb: int, rs_lb: int, rvol_lb: int, vol_lb: int) -> int:
+    """Bars needed per symbol — vol_ratio needs lookback + 1 closes for `lookback` returns."""
+    return max(slope_lb, rs_lb, rvol_lb, vol_lb + 1)
 
 
-def _zscore_and_score(raw_df: pd.DataFrame, prefix: str) -> pd.DataFrame:
+def _bench_stats(bench_df: pd.DataFrame, rs_lb: int, vol_lb: int) -> tuple[float, float]:
+    """Benchmark log return over rs_lb and log-return std over vol_lb (NaN if zero)."""
+    # One log pass over the benchmark window, shared by the return and the std
+    log_bench = np.log(bench_df["close"].to_numpy(dtype=float)[-max(rs_lb, vol_lb + 1):])
+    bench_ret = log_bench[-1] - log_bench[-rs_lb] if len(log_bench) >= rs_lb else np.nan
+    bench_vol = _log_return_std(log_bench, vol_lb) if len(log_bench) >= vol_lb else np.nan
+    if bench_vol == 0:
+        bench_vol = np.nan
+    return bench_ret, bench_vol
+
+
+def _universe_components(universe: UniverseTF,
+                         bench_df: pd.DataFrame,
+                         slope_lb: int,
+                         rs_lb: int,
+                         rvol_lb: int,
+                         vol_lb: int) -> dict:
     """
-    Take a DataFrame of raw components, z-score them across the universe,
-    then compute a blended score per row.
+    Raw indicator values for every symbol of one timeframe at once:
+      slope     — OLS slope of log(close) over slope_lb bars
+      rs        — log return over rs_lb bars minus the benchmark's
+      rvol      — last bar volume / mean volume over rvol_lb bars
+      vol_ratio — std of the last vol_lb log returns / the benchmark's
+    Each is NaN where the symbol has fewer bars than its lookback; rvol
+    is NaN on a zero average volume. With numba all four come from one
+    fused, parallel kernel; without it, from column reductions over the
+    universe's (N_symbols, L) arrays.
     """
-    df = raw_df.copy()
+    n = _window(slope_lb, rs_lb, rvol_lb, vol_lb)
+    # Log prices once per timeframe — slope, RS and vol_ratio all read them
+    log_close = np.log(universe.closes[:, -n:], dtype=np.float64)
+    volume = universe.volumes[:, -n:]
+    lengths = universe.lengths
+    bench_ret, bench_vol = _bench_stats(bench_df, rs_lb, vol_lb)
+
+    if HAS_NUMBA:
+        slope, rs, rvol, vol_ratio = compute_all(
+            log_close, volume, lengths, bench_ret, bench_vol,
+            _slope_weights(slope_lb), rs_lb, rvol_lb, vol_lb,
+        )
+        return {"slope": slope, "rs": rs, "rvol": rvol, "vol_ratio": vol_ratio}
 
-    # Z-score each component across the universe
-    z_slope = zscore(df[f"{prefix}_slope"])
-    z_rs    = zscore(df[f"{prefix}_rs"])
-    z_rvol  = zscore(df[f"{prefix}_rvol"])
-    # Invert vol_ratio: lower relative vol = better → negate before z-scoring
-    z_vol   = zscore(-df[f"{prefix}_vol_ratio"])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # Closed-form OLS slope of log(close) against bar index
+        slope = log_close[:, -slope_lb:] @ _slope_weights(slope_lb)
+
+        rs = log_close[:, -1] - log_close[:, -rs_lb] - bench_ret
+
+        avg_vol = volume[:, -rvol_lb:].mean(axis=1)
+        rvol = np.where(avg_vol == 0, np.nan, volume[:, -1] / avg_vol)
+
+        # Sample std over the returns each symbol actually has in the window —
+        # a history of exactly `vol_lb` bars yields vol_lb - 1 returns
+        returns = np.diff(log_close[:, -(vol_lb + 1):], axis=1)
+        count = (~np.isnan(returns)).sum(axis=1)
+        mean = np.nansum(returns, axis=1) / count
+        ss = np.nansum((returns - mean[:, None]) ** 2, axis=1)
+        stock_vol = np.where(count >= 2, np.sqrt(ss / (count - 1)), np.nan)
+
+        vol_ratio = np.where(lengths >= vol_lb, stock_vol / bench_vol, np.nan)
+
+    return {"slope": slope, "rs": rs, "rvol": rvol, "vol_ratio": vol_ratio}
 
-    df[f"{prefix}_z_slope"]  = z_slope
-    df[f"{prefix}_z_rs"]     = z_rs
-    df[f"{prefix}_z_rvol"]   = z_rvol
-    df[f"{prefix}_z_vol"]    = z_vol
 
-    df[f"{prefix}_score"] = (
-        W_SLOPE   * z_slope.fillna(0)
-      + W_RS      * z_rs.fillna(0)
-      + W_RVOL    * z_rvol.fillna(0)
-      + W_VOL_ADJ * z_vol.fillna(0)
-    )
+def _zscore_and_score(components: dict[str, dict]) -> tuple[dict, np.ndarray]:
+    """
+    Z-score every timeframe's raw components across the universe in one
+    pass, then blend each timeframe's z-scores into its score.
+    Returns the z/score/bias output columns and the (N, n_tf) score matrix.
+    """
+    # (N, n_tf, 4): slope, rs, rvol, vol_ratio per timeframe
+    raw = np.stack([
+        np.column_stack([c["slope"], c["rs"], c["rvol"], c["vol_ratio"]])
+        for c in components.values()
+    ], axis=1)
+    # Invert vol_ratio: lower relative vol = better → negate before z-scoring
+    raw[:, :, 3] = -raw[:, :, 3]
 
-    df[f"{prefix}_bias"] = df[f"{prefix}_score"].apply(sign)
+    # Every (timeframe, component) column is z-scored independently
+    Z = _zscore_columns(raw.reshape(len(raw), -1)).reshape(raw.shape)
+    scores = np.where(np.isnan(Z), 0.0, Z) @ COMPONENT_WEIGHTS
 
-    return df
+    columns = {}
+    for t, prefix in enumerate(components):
+        columns.update({
+            f"{prefix}_z_slope": Z[:, t, 0],
+            f"{prefix}_z_rs":    Z[:, t, 1],
+            f"{prefix}_z_rvol":  Z[:, t, 2],
+            f"{prefix}_z_vol":   Z[:, t, 3],
+            f"{prefix}_score":   scores[:, t],
+            f"{prefix}_bias":    np.sign(scores[:, t]).astype(np.int8),
+        })
+    return columns, scores
 
 
 # -------------------------
@@ -154,82 +205,71 @@ def compute_stock_rs(data_daily: dict,
 
     has_hourly = data_hourly is not None and spy_hourly is not None
 
-    # --- Pass 1: Collect raw components for every symbol ---
-    rows = []
-    symbols_used = []
-
-    for symbol in data_daily:
+    # --- Pass 1: Raw components for the whole universe, per timeframe ---
+    # A symbol shorter than every lookback on every timeframe has no
+    # component to score — drop it up front and report the counts once.
+    # Short on some timeframes only still scores on the others, and its
+    # NaN components are skipped by the z-scores, so it stays in
+    min_weekly = min(LOOKBACKS["weekly"])
+    min_daily = min(LOOKBACKS["daily"])
+    min_hourly = min(LOOKBACKS["hourly"])
+    symbols = []
+    no_weekly = too_short = 0
+    for symbol, daily_df in data_daily.items():
         if symbol == BENCHMARK:
             continue
-        if symbol not in data_weekly:
-            logger.warning(f"{symbol}: no weekly data — skipping")
+        weekly_df = data_weekly.get(symbol)
+        if weekly_df is None:
+            no_weekly += 1
+            continue
+        hourly_df = data_hourly.get(symbol) if has_hourly and data_hourly else None
+        if (len(weekly_df) < min_weekly and len(daily_df) < min_daily
+                and (hourly_df is None or len(hourly_df) < min_hourly)):
+            too_short += 1
             continue
+        symbols.append(symbol)
 
-        daily_df  = data_daily[symbol]
-        weekly_df = data_weekly[symbol]
-
-        w = _collect_raw_components(weekly_df, spy_weekly,
-                                    slope_lb=4, rs_lb=4, rvol_lb=4, vol_lb=4)
-        d = _collect_raw_components(daily_df, spy_daily,
-                                    slope_lb=5, rs_lb=10, rvol_lb=10, vol_lb=10)
-
-        row = {
-            "symbol": symbol,
-            "sector": SECTOR_MAP.get(symbol),
-            "weekly_slope": w["slope"],
-            "weekly_rs": w["rs"],
-            "weekly_rvol": w["rvol"],
-            "weekly_vol_ratio": w["vol_ratio"],
-            "daily_slope": d["slope"],
-            "daily_rs": d["rs"],
-            "daily_rvol": d["rvol"],
-            "daily_vol_ratio": d["vol_ratio"],
-        }
-
-        if has_hourly and data_hourly is not None and symbol in data_hourly and spy_hourly is not None:
-            h = _collect_raw_components(
-                data_hourly[symbol], spy_hourly,
-                slope_lb=10, rs_lb=20, rvol_lb=20, vol_lb=20,
-            )
-            row.update({
-                "hourly_slope": h["slope"],
-                "hourly_rs": h["rs"],
-                "hourly_rvol": h["rvol"],
-                "hourly_vol_ratio": h["vol_ratio"],
-            })
-
-        rows.append(row)
-        symbols_used.append(symbol)
-
-    df = pd.DataFrame(rows)
-
-    if df.empty:
-        return df
+    if no_weekly:
+        logger.warning(f"{no_weekly} symbol(s) with no weekly data — skipping")
+    if too_short:
+        logger.warning(f"{too_short} symbol(s) with too little history on every timeframe — skipping")
 
-    # --- Pass 2: Z-score normalize across the universe, then score ---
-    df = _zscore_and_score(df, "weekly")
-    df = _zscore_and_score(df, "daily")
-
-    if has_hourly and "hourly_slope" in df.columns:
-        df = _zscore_and_score(df, "hourly")
-        df["composite_score"] = (
-            W_WEEKLY * df["weekly_score"]
-          + W_DAILY  * df["daily_score"]
-          + W_HOURLY * df["hourly_score"]
-        )
-        biases = df[["weekly_bias", "daily_bias", "hourly_bias"]]
-    else:
-        df["composite_score"] = (
-            0.55 * df["weekly_score"]
-          + 0.45 * df["daily_score"]
-        )
-        biases = df[["weekly_bias", "daily_bias"]]
+    if not symbols:
+        return pd.DataFrame()
 
-    # Aligned = all biases agree and none are zero
-    df["aligned"] = biases.apply(
-        lambda r: len(set(r)) == 1 and 0 not in set(r), axis=1
-    )
+    components = {}
+    for tf, data, bench in (("weekly", data_weekly, spy_weekly), ("daily", data_daily, spy_daily)):
+        lookbacks = LOOKBACKS[tf]
+        universe = UniverseTF.from_frames(data, symbols, _window(*lookbacks))
+        components[tf] = _universe_components(universe, bench, *lookbacks)
 
-    df = df.sort_values("composite_score", ascending=False).reset_index(drop=True)
+    if has_hourly and data_hourly is not None and spy_hourly is not None:
+        lookbacks = LOOKBACKS["hourly"]
+        # Symbols without hourly bars have zero-length rows → NaN components
+        universe = UniverseTF.from_frames(data_hourly, symbols, _window(*lookbacks))
+        if universe.present.any():
+            components["hourly"] = _universe_components(universe, spy_hourly, *lookbacks)
+
+    # --- Pass 2: Z-score normalize across the universe, then score ---
+    scored, scores = _zscore_and_score(components)
+    composite = scores @ TF_WEIGHTS[tuple(components)]
+
+    # Aligned = all biases agree and none are zero. Biases are in
+    # {-1, 0, 1}, so that holds exactly when |sum| equals the count
+    biases = np.sign(scores).astype(np.int8)
+    aligned = np.abs(biases.sum(axis=1)) == len(components)
+
+    df = pd.DataFrame({
+        "symbol": symbols,
+        "sector": [SECTOR_MAP.get(s) for s in symbols],
+        **{f"{tf}_{k}": v for tf, comps in components.items() for k, v in comps.items()},
+        **scored,
+        "composite_score": composite,
+        "aligned": aligned,
+    })
+
+    # Descending, NaN last; stable so ties keep universe order
+    order = np.argsort(-df["composite_score"].to_numpy(), kind="stable")
+    df = df.take(order).reset_index(drop=True)
 
     return df
\ No newline at end of file
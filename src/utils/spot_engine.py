@@ -15,6 +15,7 @@ import pandas as pd
 import logging
 
 from src.models.sector_map import SECTOR_MAP
+from src.utils.universe import UniverseTF
 
 logger = logging.getLogger(__name__)
 
@@ -22,315 +23,243 @@ BENCHMARK = "SPY"
 
 
 # -------------------------
-# ATR
+# Universe-wide metrics
 # -------------------------
 
-def compute_atr(df: pd.DataFrame, lookback: int = 14) -> float:
-    """
-    Average True Range over `lookback` bars.
-    Expects DataFrame with 'high', 'low', 'close' columns.
-    """
-    if len(df) < lookback + 1:
-        return np.nan
+# Each symbol's bars are stacked per timeframe (see UniverseTF), so every
+# metric below is one NumPy reduction across the universe. A metric is NaN
+# for a symbol whose history is shorter than its lookback, and a ratio is
+# NaN where its denominator is zero or NaN.
 
-    high = df["high"].iloc[-(lookback + 1):]
-    low = df["low"].iloc[-(lookback + 1):]
-    close = df["close"].iloc[-(lookback + 1):]
-
-    prev_close = close.shift(1)
-
-    tr = pd.concat([
-        high - low,
-        (high - prev_close).abs(),
-        (low - prev_close).abs(),
-    ], axis=1).max(axis=1)
+ATR_LOOKBACK        = 14
+LEVELS_LOOKBACK     = 20
+RVOL_DAILY_LOOKBACK = 20
 
-    # Drop the first NaN from shift
-    tr = tr.iloc[1:]
+# RS / RVOL lookback per intraday timeframe
+INTRADAY_LOOKBACKS = {"1h": 10, "15m": 16, "5m": 12}
 
-    return float(tr.rolling(lookback).mean().iloc[-1])
+W_1H  = 0.50
+W_15M = 0.30
+W_5M  = 0.20
 
+# Same order as INTRADAY_LOOKBACKS
+INTRADAY_WEIGHTS = np.array([W_1H, W_15M, W_5M])
 
-# -------------------------
-# Range Consumed
-# -------------------------
 
-def compute_range_consumed(df: pd.DataFrame, atr: float) -> float:
+def _atr_columns(u: UniverseTF, lookback: int) -> np.ndarray:
     """
-    How much of the expected range (ATR) has been consumed today/this period.
-    (current_price - period_low) / ATR
+    Average True Range per row: mean true range over the last `lookback`
+    bars, the bar before them only seeding the previous close.
+    NaN where fewer than lookback + 1 bars.
     """
-    if pd.isna(atr) or atr == 0 or df.empty:
-        return np.nan
-
-    current = float(df["close"].iloc[-1])
-    period_low = float(df["low"].iloc[-1]) if len(df) == 1 else float(df["low"].min())
-
-    return float((current - period_low) / atr)
-
-
-def compute_daily_range_consumed(daily_df: pd.DataFrame, daily_atr: float) -> float:
-    """Range consumed for the most recent trading day."""
-    if daily_df.empty or pd.isna(daily_atr) or daily_atr == 0:
-        return np.nan
-
-    last_row = daily_df.iloc[-1]
-    current = float(last_row["close"])
-    day_low = float(last_row["low"])
-
-    return float((current - day_low) / daily_atr)
-
-
-def compute_weekly_range_consumed(weekly_df: pd.DataFrame, weekly_atr: float) -> float:
-    """Range consumed for the most recent trading week."""
-    if weekly_df.empty or pd.isna(weekly_atr) or weekly_atr == 0:
-        return np.nan
-
-    last_row = weekly_df.iloc[-1]
-    current = float(last_row["close"])
-    week_low = float(last_row["low"])
-
-    return float((current - week_low) / weekly_atr)
-
-
-# -------------------------
-# Intraday RS vs Benchmark
-# -------------------------
-
-def compute_intraday_rs(stock_close: pd.Series,
-                        bench_close: pd.Series,
-                        lookback: int) -> float:
-    """Log-return RS over lookback bars (intraday timeframe)."""
-    if len(stock_close) < lookback or len(bench_close) < lookback:
-        return np.nan
-    stock_ret = np.log(stock_close.iloc[-1]) - np.log(stock_close.iloc[-lookback])  # pyright: ignore[reportAttributeAccessIssue]
-    bench_ret = np.log(bench_close.iloc[-1]) - np.log(bench_close.iloc[-lookback])  # pyright: ignore[reportAttributeAccessIssue]
-    return float(stock_ret - bench_ret)
+    n = lookback + 1
+    high = u.highs[:, -n:][:, 1:]
+    low = u.lows[:, -n:][:, 1:]
+    prev_close = u.closes[:, -n:][:, :-1]
+    tr = np.maximum.reduce([
+        high - low,
+        np.abs(high - prev_close),
+        np.abs(low - prev_close),
+    ])
+    return np.where(u.lengths >= n, tr.mean(axis=1, dtype=np.float64), np.nan)
 
 
-# -------------------------
-# Intraday Score (per timeframe)
-# -------------------------
+def _range_consumed_columns(u: UniverseTF, atr: np.ndarray) -> np.ndarray:
+    """(last close - last low) / ATR; NaN without bars or a usable ATR."""
+    usable = u.present & (atr != 0) & ~np.isnan(atr)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(usable, (u.closes[:, -1] - u.lows[:, -1]) / atr, np.nan)
 
-def _score_intraday_tf(stock_df: pd.DataFrame,
-                       bench_df: pd.DataFrame,
-                       rs_lb: int,
-                       atr_lb: int = 14) -> dict:
-    """Score a single intraday timeframe."""
-    rs = compute_intraday_rs(stock_df["close"], bench_df["close"], rs_lb)
-    atr = compute_atr(stock_df, atr_lb)
-
-    # Relative volume: last bar vs average
-    if len(stock_df) >= rs_lb:
-        avg_vol = stock_df["volume"].iloc[-rs_lb:].mean()
-        last_vol = float(stock_df["volume"].iloc[-1])
-        rvol = last_vol / avg_vol if avg_vol > 0 else np.nan
-    else:
-        rvol = np.nan
 
-    return {
-        "rs": rs,
-        "atr": atr,
-        "rvol": rvol,
-    }
-
-
-# -------------------------
-# Distance from Key Levels
-# -------------------------
-
-def compute_levels(daily_df: pd.DataFrame, lookback_20d: int = 20) -> dict:
+def _daily_block(u: UniverseTF) -> dict:
     """
-    Compute distance from key price levels.
+    Everything the daily bars feed — ATR, range consumed and key levels —
+    from one pass over the stacked daily arrays: the ATR window, the last
+    bar and the 20-bar window are all views of the same rows.
     """
-    if daily_df.empty:
-        return {
-            "price": np.nan,
-            "daily_high": np.nan,
-            "daily_low": np.nan,
-            "pct_from_daily_high": np.nan,
-            "pct_from_daily_low": np.nan,
-            "high_20d": np.nan,
-            "low_20d": np.nan,
-            "pct_from_20d_high": np.nan,
-            "pct_from_20d_low": np.nan,
-        }
+    atr = _atr_columns(u, ATR_LOOKBACK)
 
-    current = float(daily_df["close"].iloc[-1])
-    last_day = daily_df.iloc[-1]
-    daily_high = float(last_day["high"])
-    daily_low = float(last_day["low"])
+    # float64 from here — one value per symbol, and the output columns
+    price = u.closes[:, -1].astype(np.float64)
+    daily_high = u.highs[:, -1].astype(np.float64)
+    daily_low = u.lows[:, -1].astype(np.float64)
+    high_20d = np.nanmax(u.highs[:, -LEVELS_LOOKBACK:], axis=1).astype(np.float64)
+    low_20d = np.nanmin(u.lows[:, -LEVELS_LOOKBACK:], axis=1).astype(np.float64)
 
-    recent = daily_df.iloc[-lookback_20d:] if len(daily_df) >= lookback_20d else daily_df
-    high_20d = float(recent["high"].max())
-    low_20d = float(recent["low"].min())
+    def pct_from(level: np.ndarray) -> np.ndarray:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(price != 0, (price - level) / price * 100, np.nan)
 
     return {
-        "price": current,
+        "atr": atr,
+        "range_consumed": _range_consumed_columns(u, atr),
+        "price": price,
         "daily_high": daily_high,
         "daily_low": daily_low,
-        "pct_from_daily_high": (current - daily_high) / current * 100 if current else np.nan,
-        "pct_from_daily_low": (current - daily_low) / current * 100 if current else np.nan,
+        "pct_from_daily_high": pct_from(daily_high),
+        "pct_from_daily_low": pct_from(daily_low),
         "high_20d": high_20d,
         "low_20d": low_20d,
-        "pct_from_20d_high": (current - high_20d) / current * 100 if current else np.nan,
-        "pct_from_20d_low": (current - low_20d) / current * 100 if current else np.nan,
+        "pct_from_20d_high": pct_from(high_20d),
+        "pct_from_20d_low": pct_from(low_20d),
     }
 
 
-# -------------------------
-# Intraday Momentum Composite
-# -------------------------
+def _log_return(close: pd.Series, lookback: int) -> float:
+    """log(close[-1]) - log(close[-lookback]), NaN if history is too short."""
+    if len(close) < lookback:
+        return np.nan
+    values = close.to_numpy(dtype=float)
+    return float(np.log(values[-1]) - np.log(values[-lookback]))
 
-W_1H  = 0.50
-W_15M = 0.30
-W_5M  = 0.20
 
+def _log_return_columns(u: UniverseTF, lookback: int) -> np.ndarray:
+    """log(close[-1]) - log(close[-lookback]) per row, NaN if history is too short."""
+    ret = np.log(u.closes[:, -1], dtype=np.float64) - np.log(u.closes[:, -lookback], dtype=np.float64)
+    return np.where(u.lengths >= lookback, ret, np.nan)
 
-def _sign(x: float) -> int:
-    if pd.isna(x):
-        return 0
-    return 1 if x > 0 else (-1 if x < 0 else 0)
 
+def _rvol_columns(u: UniverseTF, lookback: int) -> np.ndarray:
+    """Last bar volume / average over `lookback` bars; NaN if short or zero average."""
+    avg_vol = u.volumes[:, -lookback:].mean(axis=1)
+    usable = (u.lengths >= lookback) & (avg_vol > 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(usable, u.volumes[:, -1] / avg_vol, np.nan)
 
-# -------------------------
-# Single Symbol Spot Scan
-# -------------------------
 
-def spot_scan_symbol(
-    symbol: str,
+def _spot_metrics(
+    symbols: list[str],
     data_daily: dict,
     data_weekly: dict,
     data_1h: dict,
     data_15m: dict,
     data_5m: dict,
-) -> dict | None:
+) -> pd.DataFrame:
     """
-    Full spot scan for a single symbol.
-    Returns a dict of all metrics, or None if data is missing.
+    Spot metrics for `symbols`, one row each in the same order.
+    Every symbol must have daily bars, and so must the benchmark.
     """
-    spy_daily  = data_daily.get(BENCHMARK)
-    spy_weekly = data_weekly.get(BENCHMARK)
-    spy_1h     = data_1h.get(BENCHMARK)
-    spy_15m    = data_15m.get(BENCHMARK)
-    spy_5m     = data_5m.get(BENCHMARK)
-
-    stock_daily  = data_daily.get(symbol)
-    stock_weekly = data_weekly.get(symbol)
-    stock_1h     = data_1h.get(symbol)
-    stock_15m    = data_15m.get(symbol)
-    stock_5m     = data_5m.get(symbol)
-
-    if stock_daily is None or spy_daily is None:
-        logger.warning(f"{symbol}: missing daily data — skipping")
-        return None
-
-    # --- ATR ---
-    weekly_atr = compute_atr(stock_weekly, 14) if stock_weekly is not None else np.nan
-    daily_atr  = compute_atr(stock_daily, 14)
-    hourly_atr = compute_atr(stock_1h, 14) if stock_1h is not None else np.nan
-
-    # --- Range Consumed ---
-    daily_consumed  = compute_daily_range_consumed(stock_daily, daily_atr)
-    weekly_consumed = compute_weekly_range_consumed(stock_weekly, weekly_atr) if stock_weekly is not None else np.nan
-
-    # --- Key Levels ---
-    levels = compute_levels(stock_daily)
-
-    # --- Intraday RS + Score per timeframe ---
-    h1 = None
-    if stock_1h is not None and spy_1h is not None:
-        h1 = _score_intraday_tf(stock_1h, spy_1h, rs_lb=10)
-
-    m15 = None
-    if stock_15m is not None and spy_15m is not None:
-        m15 = _score_intraday_tf(stock_15m, spy_15m, rs_lb=16)
-
-    m5 = None
-    if stock_5m is not None and spy_5m is not None:
-        m5 = _score_intraday_tf(stock_5m, spy_5m, rs_lb=12)
+    daily = UniverseTF.from_frames(
+        data_daily, symbols, max(ATR_LOOKBACK + 1, LEVELS_LOOKBACK, RVOL_DAILY_LOOKBACK),
+    )
+    weekly = UniverseTF.from_frames(data_weekly, symbols, ATR_LOOKBACK + 1)
+
+    # --- ATR + Range Consumed + Key Levels ---
+    day = _daily_block(daily)
+    weekly_atr = _atr_columns(weekly, ATR_LOOKBACK)
+
+    # --- Intraday RS / RVOL / ATR per timeframe ---
+    # A timeframe only scores where both the symbol and the benchmark have bars
+    intraday = {}
+    for tf, data in (("1h", data_1h), ("15m", data_15m), ("5m", data_5m)):
+        lb = INTRADAY_LOOKBACKS[tf]
+        u = UniverseTF.from_frames(data, symbols, max(ATR_LOOKBACK + 1, lb))
+        bench = data.get(BENCHMARK)
+        active = u.present & (bench is not None)
+        # Benchmark return is the same for every symbol — computed once
+        bench_ret = _log_return(bench["close"], lb) if bench is not None else np.nan
+        atr = _atr_columns(u, ATR_LOOKBACK)
+        intraday[tf] = {
+            "universe": u,
+            "active": active,
+            "atr": atr,
+            "rs": np.where(active, _log_return_columns(u, lb) - bench_ret, np.nan),
+            "rvol": np.where(active, _rvol_columns(u, lb), np.nan),
+        }
 
     # --- Intraday Momentum Composite ---
-    scores = []
-    if h1 is not None and not pd.isna(h1["rs"]):
-        scores.append(("1h", h1["rs"], W_1H))
-    if m15 is not None and not pd.isna(m15["rs"]):
-        scores.append(("15m", m15["rs"], W_15M))
-    if m5 is not None and not pd.isna(m5["rs"]):
-        scores.append(("5m", m5["rs"], W_5M))
-
-    if scores:
-        total_weight = sum(w for _, _, w in scores)
-        intraday_composite = sum(rs * w for _, rs, w in scores) / total_weight
-    else:
-        intraday_composite = np.nan
-
-    # --- Intraday Volume (most recent bar vs average) ---
-    if stock_5m is not None and len(stock_5m) >= 12:
-        today_vol = float(stock_daily["volume"].iloc[-1]) if not stock_daily.empty else np.nan
-        avg_vol_20d = float(stock_daily["volume"].iloc[-20:].mean()) if len(stock_daily) >= 20 else np.nan
-        rvol_daily = today_vol / avg_vol_20d if avg_vol_20d and avg_vol_20d > 0 else np.nan
-    else:
-        rvol_daily = np.nan
-
-    # --- Bias alignment ---
-    biases = []
-    if h1 is not None:
-        biases.append(_sign(h1["rs"]))
-    if m15 is not None:
-        biases.append(_sign(m15["rs"]))
-    if m5 is not None:
-        biases.append(_sign(m5["rs"]))
-
-    aligned = len(set(biases)) == 1 and 0 not in biases and len(biases) > 0
+    # Weighted mean of the RS values each symbol has
+    rs = np.column_stack([intraday[tf]["rs"] for tf in INTRADAY_LOOKBACKS])
+    active = np.column_stack([intraday[tf]["active"] for tf in INTRADAY_LOOKBACKS])
+    scored = ~np.isnan(rs)
+    weights = np.where(scored, INTRADAY_WEIGHTS, 0.0)
+    total_weight = weights.sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        intraday_composite = np.where(
+            total_weight > 0,
+            np.where(scored, rs * INTRADAY_WEIGHTS, 0.0).sum(axis=1) / total_weight,
+            np.nan,
+        )
 
-    return {
-        "symbol": symbol,
-        "sector": SECTOR_MAP.get(symbol),
-        "price": levels["price"],
+    # --- Intraday Volume (today's daily volume vs 20-day average) ---
+    avg_vol_20d = np.where(
+        daily.lengths >= RVOL_DAILY_LOOKBACK,
+        daily.volumes[:, -RVOL_DAILY_LOOKBACK:].mean(axis=1),
+        np.nan,
+    )
+    has_5m = intraday["5m"]["universe"].lengths >= INTRADAY_LOOKBACKS["5m"]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rvol_daily = np.where(has_5m & (avg_vol_20d > 0), daily.volumes[:, -1] / avg_vol_20d, np.nan)
+
+    # --- Bias alignment: every scored timeframe nonzero and agreeing ---
+    # Biases are in {-1, 0, 1}, so that holds exactly when |sum| equals the count
+    biases = np.where(active, np.sign(np.nan_to_num(rs)), 0).astype(np.int8)
+    n_active = active.sum(axis=1)
+    aligned = (n_active > 0) & (np.abs(biases.sum(axis=1)) == n_active)
+
+    return pd.DataFrame({
+        "symbol": symbols,
+        "sector": [SECTOR_MAP.get(s) for s in symbols],
+        "price": day["price"],
 
         # ATR
         "weekly_atr": weekly_atr,
-        "daily_atr": daily_atr,
-        "hourly_atr": hourly_atr,
+        "daily_atr": day["atr"],
+        "hourly_atr": intraday["1h"]["atr"],
 
         # Range consumed
-        "daily_range_consumed": daily_consumed,
-        "weekly_range_consumed": weekly_consumed,
+        "daily_range_consumed": day["range_consumed"],
+        "weekly_range_consumed": _range_consumed_columns(weekly, weekly_atr),
 
         # Intraday RS
-        "1h_rs": h1["rs"] if h1 else np.nan,
-        "15m_rs": m15["rs"] if m15 else np.nan,
-        "5m_rs": m5["rs"] if m5 else np.nan,
+        **{f"{tf}_rs": intraday[tf]["rs"] for tf in INTRADAY_LOOKBACKS},
 
         # Intraday RVOL per timeframe
-        "1h_rvol": h1["rvol"] if h1 else np.nan,
-        "15m_rvol": m15["rvol"] if m15 else np.nan,
-        "5m_rvol": m5["rvol"] if m5 else np.nan,
+        **{f"{tf}_rvol": intraday[tf]["rvol"] for tf in INTRADAY_LOOKBACKS},
 
         # Intraday ATR
-        "1h_atr": h1["atr"] if h1 else np.nan,
-        "15m_atr": m15["atr"] if m15 else np.nan,
-        "5m_atr": m5["atr"] if m5 else np.nan,
+        **{f"{tf}_atr": np.where(intraday[tf]["active"], intraday[tf]["atr"], np.nan)
+           for tf in INTRADAY_LOOKBACKS},
 
         # Daily volume context
         "rvol_daily": rvol_daily,
 
         # Composite
         "intraday_composite": intraday_composite,
-        "intraday_bias": _sign(intraday_composite),
+        "intraday_bias": np.sign(np.nan_to_num(intraday_composite)).astype(np.int64),
         "intraday_aligned": aligned,
 
         # Levels
-        "daily_high": levels["daily_high"],
-        "daily_low": levels["daily_low"],
-        "pct_from_daily_high": levels["pct_from_daily_high"],
-        "pct_from_daily_low": levels["pct_from_daily_low"],
-        "high_20d": levels["high_20d"],
-        "low_20d": levels["low_20d"],
-        "pct_from_20d_high": levels["pct_from_20d_high"],
-        "pct_from_20d_low": levels["pct_from_20d_low"],
-    }
+        **{k: day[k] for k in (
+            "daily_high", "daily_low", "pct_from_daily_high", "pct_from_daily_low",
+            "high_20d", "low_20d", "pct_from_20d_high", "pct_from_20d_low",
+        )},
+    })
+
+
+# -------------------------
+# Single Symbol Spot Scan
+# -------------------------
+
+def spot_scan_symbol(
+    symbol: str,
+    data_daily: dict,
+    data_weekly: dict,
+    data_1h: dict,
+    data_15m: dict,
+    data_5m: dict,
+) -> dict | None:
+    """
+    Full spot scan for a single symbol.
+    Returns a dict of all metrics, or None if data is missing.
+    """
+    if symbol not in data_daily or BENCHMARK not in data_daily:
+        logger.warning(f"{symbol}: missing daily data — skipping")
+        return None
+
+    df = _spot_metrics([symbol], data_daily, data_weekly, data_1h, data_15m, data_5m)
+    # records → plain Python scalars, as callers print and log them
+    return df.to_dict("records")[0]
 
 
 # -------------------------
@@ -348,23 +277,17 @@ def spot_scan_universe(
     Run spot scan across the entire universe.
     Returns DataFrame sorted by intraday_composite descending.
     """
-    results = []
-
-    for symbol in data_daily:
-        if symbol == BENCHMARK:
-            continue
-
-        row = spot_scan_symbol(
-            symbol, data_daily, data_weekly,
-            data_1h, data_15m, data_5m,
-        )
-        if row is not None:
-            results.append(row)
+    if BENCHMARK not in data_daily:
+        logger.warning(f"{BENCHMARK}: missing daily data — skipping universe")
+        return pd.DataFrame()
 
-    df = pd.DataFrame(results)
+    symbols = [s for s in data_daily if s != BENCHMARK]
+    if not symbols:
+        return pd.DataFrame()
 
-    if df.empty:
-        return df
+    df = _spot_metrics(symbols, data_daily, data_weekly, data_1h, data_15m, data_5m)
 
-    df = df.sort_values("intraday_composite", ascending=False).reset_index(drop=True)
-    return df
\ No newline at end of file
+    # Descending, NaN last; stable so ties keep universe order
+    order = np.argsort(-df["intraday_composite"].to_numpy(), kind="stable")
+    df = df.take(order).reset_index(drop=True)
+    return df
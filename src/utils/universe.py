@@ -0,0 +1,68 @@
+"""
+Struct-of-arrays view of one timeframe's bars across the universe.
+
+The ingestion layer hands out {symbol: DataFrame}; the engines want
+every symbol's recent bars side by side so an indicator is one NumPy
+reduction over the universe instead of one pandas call per symbol.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+# Price fields, stacked in this order by UniverseTF.from_frames
+_PRICE_FIELDS = ("high", "low", "close")
+
+
+@dataclass(frozen=True)
+class UniverseTF:
+    """
+    Last `depth` bars of each symbol as (N_symbols, depth) arrays.
+    Rows follow `symbols`; histories are right-aligned so column -1 is
+    every symbol's latest bar, and shorter histories are NaN-padded on
+    the left. `lengths` holds the number of real bars per row (0 for a
+    symbol with no data in this timeframe).
+
+    Prices are float32, the dtype bars arrive in from ingestion, so
+    stacking them is a plain copy; reductions that difference or
+    accumulate (logs, means) should ask for float64 results. Volumes are
+    float64 — ingestion's uint32 counts go past float32's exact-integer
+    range (2^24) on liquid names, and RVOL needs them exact.
+    """
+    symbols: list[str]
+    highs: np.ndarray
+    lows: np.ndarray
+    closes: np.ndarray
+    volumes: np.ndarray
+    lengths: np.ndarray
+
+    @classmethod
+    def from_frames(cls,
+                    data: dict[str, pd.DataFrame],
+                    symbols: list[str],
+                    depth: int) -> "UniverseTF":
+        """Stack the last `depth` bars of each of `symbols` found in `data`."""
+        prices = np.full((len(_PRICE_FIELDS), len(symbols), depth), np.nan, dtype=np.float32)
+        volumes = np.full((len(symbols), depth), np.nan, dtype=np.float64)
+        lengths = np.zeros(len(symbols), dtype=np.int64)
+
+        for i, symbol in enumerate(symbols):
+            df = data.get(symbol)
+            if df is None:
+                continue
+            # Column access, not df[list] — selecting a sub-frame costs more
+            # than the copy itself at these window sizes
+            k = min(len(df), depth)
+            for f, field in enumerate(_PRICE_FIELDS):
+                prices[f, i, depth - k:] = df[field].to_numpy()[len(df) - k:]
+            volumes[i, depth - k:] = df["volume"].to_numpy()[len(df) - k:]
+            lengths[i] = len(df)
+
+        highs, lows, closes = prices
+        return cls(symbols, highs, lows, closes, volumes, lengths)
+
+    @property
+    def present(self) -> np.ndarray:
+        """Rows with any bars in this timeframe."""
+        return self.lengths > 0
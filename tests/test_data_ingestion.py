@@ -0,0 +1,150 @@
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from zoneinfo import ZoneInfo
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import src.utils.data_ingestion as di
+
+ET = ZoneInfo("America/New_York")
+
+
+def et(*args) -> datetime:
+    """A US/Eastern wall-clock time as an aware UTC datetime."""
+    return datetime(*args, tzinfo=ET).astimezone(timezone.utc)
+
+
+def _utc(ts: datetime) -> pd.Timestamp:
+    """The SDK hands requests over as naive UTC — normalise for comparison."""
+    ts = pd.Timestamp(ts)
+    return ts.tz_localize("UTC") if ts.tzinfo is None else ts.tz_convert("UTC")
+
+
+def _hourly_bars(first: datetime, n: int, seed: int) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    idx = pd.date_range(first, periods=n, freq="h", name="timestamp")
+    return pd.DataFrame({
+        "open": close, "high": close * 1.01, "low": close * 0.99, "close": close,
+        "volume": rng.integers(1_000, 100_000, n).astype(float),
+        "trade_count": 1.0, "vwap": close,
+    }, index=idx)
+
+
+class FakeClient:
+    """Serves bars in [start, end) from a fixed table and records each request."""
+
+    def __init__(self, bars: dict[str, pd.DataFrame]):
+        self.bars = bars
+        self.requests = []
+
+    def get_stock_bars(self, request):
+        self.requests.append(request)
+        start, end = _utc(request.start), _utc(request.end)
+        frames = {}
+        for symbol in request.symbol_or_symbols:
+            df = self.bars[symbol]
+            frames[symbol] = df[(df.index >= start) & (df.index < end)]
+        return SimpleNamespace(df=pd.concat(frames, names=["symbol"]))
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path) -> FakeClient:
+    """Fake client over two weeks of hourly bars, with the cache in tmp_path."""
+    first = et(2026, 10, 5, 0)
+    fake = FakeClient({s: _hourly_bars(first, 24 * 15, seed) for seed, s in enumerate(["SPY", "AAA"])})
+    monkeypatch.setattr(di, "CACHE_DIR", tmp_path / "bars")
+    monkeypatch.setattr(di, "get_client", lambda: fake)
+    return fake
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Set the `now` ingestion sees: clock(datetime)."""
+    def set_now(now: datetime) -> None:
+        class Frozen(datetime):
+            @classmethod
+            def now(cls, tz=None):
+                return now.astimezone(tz) if tz else now
+        monkeypatch.setattr(di, "datetime", Frozen)
+    return set_now
+
+
+def test_current_cache_is_skipped(client, clock):
+    clock(et(2026, 10, 14, 20, 30))  # Wednesday, after the session closed
+    first = di.get_hourly_batch(["AAA"], trading_days=2)
+    assert len(client.requests) == 1
+
+    clock(et(2026, 10, 14, 23, 0))  # nothing can have printed since
+    again = di.get_hourly_batch(["AAA"], trading_days=2)
+
+    # Served from the cache — same bars, trimmed to the later window start
+    assert len(client.requests) == 1
+    expected = first["AAA"].loc[again["AAA"].index[0]:]
+    pd.testing.assert_frame_equal(again["AAA"], expected, check_dtype=False)
+    assert again["AAA"].index[-1] == _utc(et(2026, 10, 14, 20, 0))
+
+
+def test_forming_last_bar_is_dropped_and_refetched(client, clock):
+    forming = _utc(et(2026, 10, 14, 15, 0))
+    clock(et(2026, 10, 14, 15, 30))  # Wednesday, mid-session
+    first = di.get_hourly_batch(["AAA"], trading_days=2)
+    assert first["AAA"].index[-1] == forming
+
+    # The 15:00 bar finishes at a different price than it showed mid-bar
+    client.bars["AAA"].loc[forming, "close"] = 123.0
+
+    clock(et(2026, 10, 14, 16, 30))
+    again = di.get_hourly_batch(["AAA"], trading_days=2)
+
+    # One request, starting at the forming bar rather than the window start
+    assert len(client.requests) == 2
+    assert _utc(client.requests[-1].start) == forming
+    assert again["AAA"].loc[forming, "close"] == pytest.approx(123.0)
+    assert again["AAA"].index[-1] == _utc(et(2026, 10, 14, 16, 0))
+    assert not again["AAA"].index.duplicated().any()
+
+
+def test_cache_starting_too_late_refetches_window(client, clock):
+    clock(et(2026, 10, 14, 12, 0))
+    di.get_hourly_batch(["AAA"], trading_days=1)
+
+    now = et(2026, 10, 14, 13, 0)
+    clock(now)
+    again = di.get_hourly_batch(["AAA"], trading_days=4)
+
+    # Cache only reaches back one day — the full six-day window is requested
+    start = now - timedelta(days=6)
+    assert _utc(client.requests[-1].start) == _utc(start)
+    assert again["AAA"].index[0] == _utc(start).ceil("h")
+
+
+@pytest.mark.parametrize("now, expected", [
+    (et(2026, 10, 14, 12, 0), et(2026, 10, 14, 12, 0)),   # Wednesday, in session
+    (et(2026, 10, 14, 21, 0), et(2026, 10, 14, 20, 0)),   # Wednesday, after close
+    (et(2026, 10, 14, 3, 0), et(2026, 10, 13, 20, 0)),    # Wednesday, before open
+    (et(2026, 10, 17, 12, 0), et(2026, 10, 16, 20, 0)),   # Saturday
+    (et(2026, 10, 18, 12, 0), et(2026, 10, 16, 20, 0)),   # Sunday
+    (et(2026, 10, 19, 3, 0), et(2026, 10, 16, 20, 0)),    # Monday, before open
+])
+def test_last_market_activity(now, expected):
+    assert di._last_market_activity(now) == expected
+
+
+def test_weekend_uses_fridays_close(client, clock):
+    clock(et(2026, 10, 16, 18, 0))  # Friday, extended hours still open
+    di.get_hourly_batch(["AAA"], trading_days=2)
+
+    # Bars printed until 20:00 Friday — Saturday must pick them up
+    clock(et(2026, 10, 17, 10, 0))
+    di.get_hourly_batch(["AAA"], trading_days=2)
+    assert len(client.requests) == 2
+
+    # Fetched after Friday's close: nothing new all weekend or pre-market Monday
+    clock(et(2026, 10, 18, 10, 0))
+    di.get_hourly_batch(["AAA"], trading_days=2)
+    clock(et(2026, 10, 19, 3, 0))
+    di.get_hourly_batch(["AAA"], trading_days=2)
+    assert len(client.requests) == 2
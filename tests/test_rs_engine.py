@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.utils.rs_engine import compute_stock_rs
+
+
+# (weekly_score, daily_score, composite_score, aligned) per symbol, as
+# scored before the short-history pre-filter was added. SHORTW / SHORTD
+# are short on one timeframe only and must still rank where they did;
+# SHORTB (short on both) scored 0 and is now dropped, which leaves every
+# other symbol's cross-sectional z-scores unchanged.
+EXPECTED = {
+    "JPM":    (1.0719010969, 0.3713396340, 0.7566484386, True),
+    "AAPL":   (0.0608421539, 0.3474193224, 0.1898018797, True),
+    "XOM":    (0.2940590043, -0.2785793839, 0.0363717296, False),
+    "SHORTD": (-0.0505703788, 0.0, -0.0278137083, False),
+    "SHORTW": (0.0, -0.1104065383, -0.0496829422, False),
+    "KO":     (-1.1911000087, 1.1810017235, -0.1236542292, False),
+    "NVDA":   (-0.2079823911, -0.4892948163, -0.3345729824, True),
+    "MSFT":   (0.0228505234, -1.0214799414, -0.4470981857, False),
+}
+
+
+def _bars(n: int, freq: str, seed: int) -> pd.DataFrame:
+    """Random-walk OHLCV bars in the dtypes ingestion hands out."""
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, n)))
+    idx = pd.date_range("2025-01-03", periods=n, freq=freq, name="timestamp")
+    return pd.DataFrame({
+        "open": close,
+        "high": close * (1 + rng.uniform(0, 0.01, n)),
+        "low": close * (1 - rng.uniform(0, 0.01, n)),
+        "close": close,
+        "volume": rng.integers(1_000_000, 5_000_000, n),
+    }, index=idx).astype({"open": "float32", "high": "float32", "low": "float32",
+                          "close": "float32", "volume": "uint32"})
+
+
+@pytest.fixture
+def mixed_universe() -> tuple[dict, dict]:
+    symbols = ["SPY", "AAPL", "MSFT", "XOM", "JPM", "NVDA", "KO", "SHORTW", "SHORTD", "SHORTB"]
+    daily = {s: _bars(60, "B", 100 + i) for i, s in enumerate(symbols)}
+    weekly = {s: _bars(30, "W-FRI", 200 + i) for i, s in enumerate(symbols)}
+    weekly["SHORTW"] = weekly["SHORTW"].iloc[-2:]
+    daily["SHORTD"] = daily["SHORTD"].iloc[-3:]
+    weekly["SHORTB"] = weekly["SHORTB"].iloc[-2:]
+    daily["SHORTB"] = daily["SHORTB"].iloc[-3:]
+    return daily, weekly
+
+
+def test_mixed_length_universe_scores_unchanged(mixed_universe):
+    df = compute_stock_rs(*mixed_universe)
+
+    assert df["symbol"].tolist() == list(EXPECTED)
+    for row in df.itertuples():
+        weekly, daily, composite, aligned = EXPECTED[row.symbol]
+        assert row.weekly_score == pytest.approx(weekly, abs=1e-8)
+        assert row.daily_score == pytest.approx(daily, abs=1e-8)
+        assert row.composite_score == pytest.approx(composite, abs=1e-8)
+        assert row.aligned == aligned